@@ -0,0 +1,44 @@
+"""Roasts table
+
+Revision ID: 3f2a9c1d7e10
+Revises: 
+Create Date: 2026-10-19 11:40:02.318446
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7e10'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases created before migrations were tracked already have the table
+    if sa.inspect(op.get_bind()).has_table("roasts"):
+        return
+    op.create_table(
+        "roasts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("sec_from_start", sa.Text(), nullable=False),
+        sa.Column("temperature_f", sa.Text(), nullable=False),
+        sa.Column("bean_info", sa.Text(), nullable=True),
+        sa.Column("first_crack_start_time", sa.Float(), nullable=True),
+        sa.Column("first_crack_start_temp", sa.Float(), nullable=True),
+        sa.Column("second_crack_start_time", sa.Float(), nullable=True),
+        sa.Column("second_crack_start_temp", sa.Float(), nullable=True),
+        sa.Column("tasting_comments", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("roasts")
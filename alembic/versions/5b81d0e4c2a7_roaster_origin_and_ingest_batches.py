@@ -0,0 +1,43 @@
+"""Roaster origin and ingest batches
+
+Revision ID: 5b81d0e4c2a7
+Revises: 3f2a9c1d7e10
+Create Date: 2026-10-19 11:40:37.904215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b81d0e4c2a7'
+down_revision: Union[str, Sequence[str], None] = '3f2a9c1d7e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "ingest_batches",
+        sa.Column("node", sa.Text(), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("received_at", sa.DateTime(), nullable=False),
+        sa.Column("roast_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("node", "seq"),
+    )
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.add_column(sa.Column("roaster", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("source_id", sa.Integer(), nullable=True))
+        batch_op.create_unique_constraint("uq_roasts_roaster_source_id", ["roaster", "source_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.drop_constraint("uq_roasts_roaster_source_id", type_="unique")
+        batch_op.drop_column("source_id")
+        batch_op.drop_column("roaster")
+    op.drop_table("ingest_batches")
@@ -0,0 +1,30 @@
+"""Similarity features
+
+Revision ID: 7c4e2f9a1b36
+Revises: 5b81d0e4c2a7
+Create Date: 2026-10-19 11:41:12.550871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e2f9a1b36'
+down_revision: Union[str, Sequence[str], None] = '5b81d0e4c2a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.add_column(sa.Column("features", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.drop_column("features")
@@ -0,0 +1,32 @@
+"""Detected first crack
+
+Revision ID: 8d1a6b3e5f42
+Revises: 7c4e2f9a1b36
+Create Date: 2026-10-19 11:41:48.127093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d1a6b3e5f42'
+down_revision: Union[str, Sequence[str], None] = '7c4e2f9a1b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.add_column(sa.Column("detected_first_crack_time", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("detected_first_crack_temp", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.drop_column("detected_first_crack_temp")
+        batch_op.drop_column("detected_first_crack_time")
@@ -0,0 +1,30 @@
+"""Archive segment
+
+Revision ID: 9e7c3a2d4b18
+Revises: 8d1a6b3e5f42
+Create Date: 2026-10-19 11:42:20.663410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e7c3a2d4b18'
+down_revision: Union[str, Sequence[str], None] = '8d1a6b3e5f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.add_column(sa.Column("archive_segment", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.drop_column("archive_segment")
@@ -0,0 +1,40 @@
+"""Roast events
+
+Revision ID: a1f5d8c26e93
+Revises: 9e7c3a2d4b18
+Create Date: 2026-10-19 11:42:57.281935
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1f5d8c26e93'
+down_revision: Union[str, Sequence[str], None] = '9e7c3a2d4b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "roast_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("roast_id", sa.Integer(), nullable=False),
+        sa.Column("t", sa.Float(), nullable=False),
+        sa.Column("event_type", sa.Text(), nullable=False),
+        sa.Column("temp", sa.Float(), nullable=True),
+        sa.Column("value", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["roast_id"], ["roasts.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_roast_events_roast_id_t", "roast_events", ["roast_id", "t"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_roast_events_roast_id_t", table_name="roast_events")
+    op.drop_table("roast_events")
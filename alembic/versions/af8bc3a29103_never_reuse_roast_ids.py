@@ -0,0 +1,33 @@
+"""Data version and never reuse roast ids
+
+Revision ID: af8bc3a29103
+Revises: a1f5d8c26e93
+Create Date: 2026-10-19 11:43:31.121680
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'af8bc3a29103'
+down_revision: Union[str, Sequence[str], None] = 'a1f5d8c26e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite can only switch to AUTOINCREMENT by recreating the table. Without
+    # it the highest id is reused after a delete, and caches keyed on
+    # (id, data_version) would serve the deleted roast for the new one.
+    with op.batch_alter_table("roasts", recreate="always", table_kwargs={"sqlite_autoincrement": True}) as batch_op:
+        batch_op.add_column(sa.Column("data_version", sa.Integer(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("roasts", recreate="always", table_kwargs={"sqlite_autoincrement": False}) as batch_op:
+        batch_op.drop_column("data_version")
@@ -0,0 +1,30 @@
+"""Roast tags
+
+Revision ID: b4c2e7f19a05
+Revises: af8bc3a29103
+Create Date: 2026-10-19 11:44:05.730288
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4c2e7f19a05'
+down_revision: Union[str, Sequence[str], None] = 'af8bc3a29103'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.add_column(sa.Column("tags", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.drop_column("tags")
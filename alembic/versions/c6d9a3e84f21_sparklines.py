@@ -0,0 +1,30 @@
+"""Sparklines
+
+Revision ID: c6d9a3e84f21
+Revises: b4c2e7f19a05
+Create Date: 2026-10-19 11:44:39.016552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6d9a3e84f21'
+down_revision: Union[str, Sequence[str], None] = 'b4c2e7f19a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.add_column(sa.Column("sparkline", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("roasts") as batch_op:
+        batch_op.drop_column("sparkline")
@@ -3,9 +3,29 @@ from dash import Dash, html, dcc, Input, Output
 import logging
 import subprocess
 
+from config import INGEST_SERVER, INGEST_URL
+from utils.api_utils import register_api_routes
+from utils.archive_utils import start_maintenance
+from utils.figure_utils import register_figure_routes
+from utils.ingest_utils import register_ingest_routes, start_uploader
+from utils.latency_utils import register_latency_routes
+from utils.profile_utils import profile_callback, register_profiling_routes
+from utils.sparkline_utils import start_sparkline_backfill
+from utils.temp_utils import recording
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 app = Dash(__name__, use_pages=True)
+register_profiling_routes(app.server)
+register_figure_routes(app.server)
+register_latency_routes(app.server)
+register_api_routes(app.server)
+if INGEST_SERVER:
+    register_ingest_routes(app.server)
+if INGEST_URL:
+    start_uploader(INGEST_URL)
+start_maintenance(recording)
+start_sparkline_backfill()
 
 
 def get_page_relative_path(page_module_name: str) -> str:
@@ -65,6 +85,7 @@ app.layout = html.Div([
     Input("shutdown-button", "n_clicks"),
     prevent_initial_call=True
 )
+@profile_callback
 def initiate_shutdown(n_clicks):
     if not n_clicks:
         return dash.no_update
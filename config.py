@@ -0,0 +1,63 @@
+"""Runtime settings, overridable with environment variables."""
+
+import os
+import socket
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean flag from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+DATABASE_URL = os.environ.get("ROAST_DATABASE_URL", "sqlite:///data/roast_data.db")
+
+# Callback profiling (see utils/profile_utils.py)
+PROFILE_CALLBACKS = env_flag("ROAST_PROFILE_CALLBACKS")
+PROFILE_DIR = os.environ.get("ROAST_PROFILE_DIR", "data/profiles")
+
+# MAX31856 driver (see utils/max31856_utils.py)
+THERMOCOUPLE_TYPE = os.environ.get("ROAST_THERMOCOUPLE_TYPE", "K")
+THERMOCOUPLE_AVERAGING = int(os.environ.get("ROAST_THERMOCOUPLE_AVERAGING", "1"))
+MAINS_HZ = int(os.environ.get("ROAST_MAINS_HZ", "60"))
+
+# Adaptive sampling (see AdaptiveSampling in utils/pipeline_utils.py). Fast while
+# recording or while |RoR| is above the threshold (°F/min), idle otherwise.
+SAMPLE_FAST_INTERVAL = float(os.environ.get("ROAST_SAMPLE_FAST_INTERVAL", "0.5"))
+SAMPLE_IDLE_INTERVAL = float(os.environ.get("ROAST_SAMPLE_IDLE_INTERVAL", "5"))
+SAMPLE_FAST_ROR = float(os.environ.get("ROAST_SAMPLE_FAST_ROR", "15"))
+
+# Sample pipeline (see utils/pipeline_utils.py). Filters are off unless set.
+SPIKE_MAX_JUMP_F = float(os.environ.get("ROAST_SPIKE_MAX_JUMP_F", "0"))
+MEDIAN_WINDOW = int(os.environ.get("ROAST_MEDIAN_WINDOW", "1"))
+EMA_ALPHA = float(os.environ.get("ROAST_EMA_ALPHA", "0"))
+RECORDING_JOURNAL_PATH = os.environ.get("ROAST_RECORDING_JOURNAL")
+
+# Archive tiering (see utils/archive_utils.py). Off (0) unless set, since
+# archived curves are stored as float32.
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ROAST_ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_DIR = os.environ.get("ROAST_ARCHIVE_DIR", "data/archive")
+MAINTENANCE_HOUR = int(os.environ.get("ROAST_MAINTENANCE_HOUR", "3"))
+
+# Sensor replay (see utils/replay_utils.py): "synthetic" or a stored roast id
+REPLAY_SOURCE = os.environ.get("ROAST_REPLAY")
+REPLAY_SPEEDUP = float(os.environ.get("ROAST_REPLAY_SPEEDUP", "60"))
+
+# Multi-roaster ingestion (see utils/ingest_utils.py)
+ROASTER_NAME = os.environ.get("ROAST_ROASTER_NAME", socket.gethostname())
+INGEST_URL = os.environ.get("ROAST_INGEST_URL")  # Central instance to upload to
+INGEST_SERVER = env_flag("ROAST_INGEST_SERVER")  # Accept uploads from other nodes
+INGEST_BATCH_SIZE = int(os.environ.get("ROAST_INGEST_BATCH_SIZE", "20"))
+INGEST_PERIOD_SEC = float(os.environ.get("ROAST_INGEST_PERIOD_SEC", "30"))
+INGEST_STATE_PATH = os.environ.get("ROAST_INGEST_STATE_PATH", "data/ingest_state.json")
+
+# Sensor-to-screen latency trace, appended as CSV when set (see utils/latency_utils.py)
+LATENCY_LOG_PATH = os.environ.get("ROAST_LATENCY_LOG")
+
+# Rendered history figures kept in memory (see utils/figure_utils.py)
+FIGURE_CACHE_SIZE = int(os.environ.get("ROAST_FIGURE_CACHE_SIZE", "32"))
+
+# Plots switch to WebGL line traces above this many points (see utils/plot_utils.py)
+WEBGL_POINT_THRESHOLD = int(os.environ.get("ROAST_WEBGL_POINT_THRESHOLD", "5000"))
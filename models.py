@@ -1,7 +1,12 @@
 import datetime
-from sqlalchemy import create_engine, Column, Integer, Float, Text, DateTime
+from sqlalchemy import (
+    create_engine, Column, Integer, Float, Text, DateTime, ForeignKey, Index, LargeBinary,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from config import DATABASE_URL
+
 Base = declarative_base()
 
 class Roast(Base):
@@ -16,15 +21,59 @@ class Roast(Base):
     first_crack_start_temp = Column(Float)
     second_crack_start_time = Column(Float)
     second_crack_start_temp = Column(Float)
+    # First crack onset flagged by the online detector (see utils/crack_utils.py)
+    detected_first_crack_time = Column(Float)
+    detected_first_crack_temp = Column(Float)
     tasting_comments = Column(Text)
+    tags = Column(Text)  # Space separated
+    # Set for roasts uploaded by another roaster node, None for local roasts
+    roaster = Column(Text)
+    source_id = Column(Integer)
+    # float32 curve features for similarity search (see utils/similarity_utils.py)
+    features = Column(LargeBinary)
+    # One byte per point thumbnail curve for the history sidebar (see utils/sparkline_utils.py)
+    sparkline = Column(LargeBinary)
+    # Archive segment holding the curves once they are moved out (see utils/archive_utils.py)
+    archive_segment = Column(Text)
+    # Bumped on every edit so cached figures of this roast are invalidated
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
 
+    # AUTOINCREMENT so ids of deleted roasts are never handed out again
+    __table_args__ = (
+        UniqueConstraint("roaster", "source_id", name="uq_roasts_roaster_source_id"),
+        {"sqlite_autoincrement": True},
+    )
 
     def __repr__(self):
         return (f"<Roast(id={self.id}, start_time='{self.start_time}', "
                 f"bean_info='{self.bean_info[:20] if self.bean_info else 'N/A'}...')>")
 
 
-DATABASE_URL = "sqlite:///data/roast_data.db"
+class RoastEvent(Base):
+    """A timestamped roast event or control-input change (see utils/event_utils.py)."""
+    __tablename__ = 'roast_events'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    roast_id = Column(Integer, ForeignKey("roasts.id", ondelete="CASCADE"), nullable=False)
+    t = Column(Float, nullable=False)  # Seconds from roast start
+    event_type = Column(Text, nullable=False)
+    temp = Column(Float)
+    # Setting for control inputs such as heat or fan, None for events
+    value = Column(Float)
+
+    __table_args__ = (Index("ix_roast_events_roast_id_t", "roast_id", "t"),)
+
+
+class IngestBatch(Base):
+    """Upload batches already accepted from roaster nodes, for idempotent retries."""
+    __tablename__ = 'ingest_batches'
+
+    node = Column(Text, primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    received_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
+    roast_count = Column(Integer, nullable=False)
+
+
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,69 +1,225 @@
 """Page to collect data."""
 
+import bisect
 import collections
 import datetime
 import json
 import logging
+import os
 import threading
+import time
 
 import dash
 import dash_daq as daq
-from dash import dcc, html, callback, Output, Input, State, ctx
+from dash import dcc, html, callback, clientside_callback, Output, Input, State, ctx
+from config import (
+    EMA_ALPHA,
+    MAINS_HZ,
+    MEDIAN_WINDOW,
+    RECORDING_JOURNAL_PATH,
+    REPLAY_SOURCE,
+    REPLAY_SPEEDUP,
+    SAMPLE_FAST_INTERVAL,
+    SAMPLE_FAST_ROR,
+    SAMPLE_IDLE_INTERVAL,
+    SPIKE_MAX_JUMP_F,
+    THERMOCOUPLE_AVERAGING,
+)
 from models import Roast, get_db
 
-from utils.temp_utils import ROAST_EVENTS, continually_read_temperature
+from utils.temp_utils import (
+    CONTROL_INPUTS, ROAST_EVENTS, continually_read_temperature, recording
+)
+from utils.crack_utils import CrackDetector
+from utils.event_utils import DETECTED_FIRST_CRACK, EventLog, first_event, write_events
+from utils.latency_utils import latency_tracker
+from utils.max31856_utils import conversion_period
 from utils.plot_utils import create_temperature_plot
+from utils.profile_utils import profile_callback
+from utils.pipeline_utils import (
+    AdaptiveSampling,
+    EmaFilter,
+    FaultRejection,
+    JournalSink,
+    MedianFilter,
+    MetricsSink,
+    Pipeline,
+    PlotBufferSink,
+    RateOfRiseChannel,
+    RecordingSink,
+    SpikeRejection,
+    UnitConversion,
+    read_journal,
+)
+from utils.reference_utils import ReferenceProfile, ReferenceTracker
+from utils.replay_utils import initialize_replay, load_roast_curve
+from utils.similarity_utils import compute_features, encode_features
+from utils.sparkline_utils import compute_sparkline
 
 pi = False
 PLOT_WINDOW_SEC = 60*2
+RECORDING_MAX_SEC = 60*30
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 dash.register_page(__name__)
 
 
-def initialize_roast_event_markers():
-    return {
-        roast_event_id(event): {
-            "name": event,
-            "data": (None, None),  # Temp, Time
-        }
-        for event in ROAST_EVENTS
-    }
-
-
 def roast_event_id(event: str) -> str:
     """Format the event name to be id friendly."""
     return f"{event.lower().replace(' ', '-')}_button"
 
 
-roast_event_markers = initialize_roast_event_markers()
+def control_input_id(control: str) -> str:
+    """Format the control input name to be id friendly."""
+    return f"{control.lower().replace(' ', '-')}_input"
+
+
+EVENT_BUTTONS = {roast_event_id(event): event for event in ROAST_EVENTS}
+CONTROL_FIELDS = {control_input_id(control): control for control in CONTROL_INPUTS}
+
+
+def get_reference_roast_options() -> list[dict]:
+    """Stored roasts that can be followed as a reference profile."""
+    with next(get_db()) as db:
+        roasts = (
+            db.query(Roast.id, Roast.start_time, Roast.bean_info)
+            .order_by(Roast.start_time.desc()).all()
+        )
+    options = []
+    for roast in roasts:
+        label = roast.start_time.strftime('%Y-%m-%d %H:%M')
+        if roast.bean_info:
+            label += f" - {roast.bean_info[:20]}"
+        options.append({"label": label, "value": roast.id})
+    return options
+
+
+event_log = EventLog()
+reference_tracker = ReferenceTracker()
+crack_detector = CrackDetector()
 
 
 @callback(
     Output("live-update-graph", "figure"),
     Output("current-temp", "children"),
+    Output("reference-delta", "children"),
+    Output("crack-forecast", "children"),
+    Output("latency-trace", "data"),
+    Output("latency-readout", "children"),
+    Output("interval-component", "interval"),
     Input("interval-component", "n_intervals"),
+    State("interval-component", "interval"),
 )
-def update_graph_live(_):
+@profile_callback
+def update_graph_live(_, poll_ms):
     """Callback to update the live temperature graph."""
+    requested_at = time.time()
     with data_lock:
         current_temp_plot = list(temp_plot)
         current_time_plot = list(time_plot)
+        last_trace = trace_plot[-1] if trace_plot else None
+
+    # The buffer spans more than the plot window while sampling slowly
+    if current_time_plot:
+        window_start = current_time_plot[-1] - datetime.timedelta(seconds=PLOT_WINDOW_SEC)
+        first = bisect.bisect_left(current_time_plot, window_start)
+        current_temp_plot = current_temp_plot[first:]
+        current_time_plot = current_time_plot[first:]
+
+    # Poll as often as the sampler produces new readings
+    new_poll_ms = round(sampling.next_interval() * 1000)
 
     plot_data = {
             "start_time": current_time_plot[0],
             "time_data": current_time_plot,
             "temp_data": current_temp_plot,
             "bean_info": None,
-            "first_crack_start_time": roast_event_markers["1st-crack-start_button"]["data"][1],
-            "first_crack_start_temp": roast_event_markers["1st-crack-start_button"]["data"][0],
-            "second_crack_start_time": roast_event_markers["2nd-crack-start_button"]["data"][1],
-            "second_crack_start_temp": roast_event_markers["2nd-crack-start_button"]["data"][0],
+            "events": event_log.snapshot(),
     }
 
+    reference = None
+    crack_forecast = ""
+    if recording.is_set():
+        reference = reference_tracker.ghost(current_time_plot[0], current_time_plot[-1])
+        crack_forecast = crack_detector.readout()
+        detected = crack_detector.detected_event()
+        if detected:
+            plot_data["events"].append(
+                {"type": DETECTED_FIRST_CRACK, "time": detected[0], "temp": detected[1], "value": None}
+            )
+
     current_temp = f"{current_temp_plot[-1]:.1f} °F" if current_temp_plot else ""
-    return create_temperature_plot([plot_data]), current_temp
+    figure = create_temperature_plot([plot_data], reference=reference)
+
+    # Stamps for the latest sample; the browser adds rendered_at and posts it back
+    trace = None
+    if last_trace is not None and last_trace[0] is not None:
+        trace = {
+            "read_at": last_trace[0],
+            "buffered_at": last_trace[1],
+            "requested_at": requested_at,
+            "served_at": time.time(),
+        }
+    return (
+        figure,
+        current_temp,
+        reference_tracker.readout(),
+        crack_forecast,
+        trace,
+        latency_tracker.readout(),
+        new_poll_ms if new_poll_ms != poll_ms else dash.no_update,
+    )
+
+
+# Report when the browser has painted the update, two animation frames after the trace arrives
+clientside_callback(
+    """
+    function(trace) {
+        if (trace) {
+            window.requestAnimationFrame(() => window.requestAnimationFrame(() => {
+                trace.rendered_at = Date.now() / 1000;
+                navigator.sendBeacon("/api/latency", JSON.stringify(trace));
+            }));
+        }
+    }
+    """,
+    Input("latency-trace", "data"),
+)
+
+
+@callback(
+    Output("reference-roast-dropdown", "options", allow_duplicate=True),
+    Output("reference-roast-dropdown", "value"),
+    Input("reference-roast-dropdown", "id"),
+    State("reference-roast-dropdown", "value"),
+    prevent_initial_call="initial_duplicate",
+)
+@profile_callback
+def refresh_reference_options(_, roast_id):
+    """Reload the reference roasts whenever the page is shown, since roasts may have been deleted."""
+    options = get_reference_roast_options()
+    if roast_id is not None and roast_id not in {option["value"] for option in options}:
+        return options, None
+    return options, dash.no_update
+
+
+@callback(
+    Output("reference-delta", "children", allow_duplicate=True),
+    Input("reference-roast-dropdown", "value"),
+    prevent_initial_call=True,
+)
+@profile_callback
+def select_reference(roast_id):
+    """Load the chosen roast as the reference profile."""
+    if roast_id is None:
+        reference_tracker.set_profile(None)
+        return ""
+
+    sec_data, temp_data = load_roast_curve(roast_id)
+    reference_tracker.set_profile(ReferenceProfile(sec_data, temp_data))
+    logging.info("Following roast %s as reference.", roast_id)
+    return reference_tracker.readout()
 
 
 @callback(
@@ -71,88 +227,117 @@ def update_graph_live(_):
     [
         [
             Output(event_button, "disabled", allow_duplicate=True)
-            for event_button in roast_event_markers
+            for event_button in EVENT_BUTTONS
         ]
     ],
     [
         [
             Output(event_button, "className", allow_duplicate=True)
-            for event_button in roast_event_markers
+            for event_button in EVENT_BUTTONS
         ]
     ],
+    Output("reference-roast-dropdown", "options"),
     Input("record-data-switch", "on"),
     State("bean-info", "value"),
     prevent_initial_call=True,
 )
+@profile_callback
 def toggle_recording(is_on, bean_info):
     """Start or stop recording."""
     if is_on:
+        # Drop anything logged since the last roast was saved
+        event_log.drain()
+        reference_tracker.reset()
+        crack_detector.reset()
         recording.set()
+        # Take the first fast sample now rather than after the idle wait
+        sampling.wake.set()
     else:
         recording.clear()
     logging.info("Data recording set to: %s", is_on)
 
-    num_markers = len(roast_event_markers)
+    num_markers = len(EVENT_BUTTONS)
     if not is_on:
         # Recording was just turned off
         write_data_to_db(bean_info)
-        return is_on, [True]*num_markers, ["button-disabled"]*num_markers
+        return (
+            is_on, [True]*num_markers, ["button-disabled"]*num_markers,
+            get_reference_roast_options(),
+        )
 
-    return is_on, [False]*num_markers, ["button-enabled"]*num_markers
+    return is_on, [False]*num_markers, ["button-enabled"]*num_markers, dash.no_update
 
 
 @callback(
     [
         [
             Output(event_button, "disabled", allow_duplicate=True)
-            for event_button in roast_event_markers
+            for event_button in EVENT_BUTTONS
         ]
     ],
     [
         [
             Output(event_button, "className", allow_duplicate=True)
-            for event_button in roast_event_markers
+            for event_button in EVENT_BUTTONS
         ]
     ],
     [
         Input(event_button, "n_clicks")
-        for event_button in roast_event_markers
+        for event_button in EVENT_BUTTONS
     ],
     prevent_initial_call = True,
 )
+@profile_callback
 def event_button_clicked(*_):
     """Record time and temp when an event button is clicked."""
     # Record event
-    event: str = ctx.triggered_id
+    event = EVENT_BUTTONS[ctx.triggered_id]
     with data_lock:
         event_time = time_recorded[-1]
         event_temp = temp_recorded[-1]
-    logging.info(
-        "%s clicked at %s with temp %s",
-        roast_event_markers[event]["name"],
-        event_time,
-        event_temp,
-    )
-    roast_event_markers[event]["data"] = (event_temp, event_time)
+    logging.info("%s clicked at %s with temp %s", event, event_time, event_temp)
+    event_log.add(event, event_time, event_temp)
 
-    # Disable button
-    num_markers = len(roast_event_markers)
-    disabled = [False]*num_markers
-    class_name = ["button-enabled"]*num_markers
-    for idx, event in enumerate(roast_event_markers):
-        if roast_event_markers[event]["data"][0] is not None:
-            disabled[idx] = True
-            class_name[idx] = "button-disabled"
+    # Disable buttons of events already logged
+    disabled = [event_log.has(event) for event in EVENT_BUTTONS.values()]
+    class_name = ["button-disabled" if logged else "button-enabled" for logged in disabled]
 
     return disabled, class_name
 
 
+@callback(
+    Output("control-log", "children"),
+    [
+        Input(control_field, "value")
+        for control_field in CONTROL_FIELDS
+    ],
+    prevent_initial_call=True,
+)
+@profile_callback
+def control_input_changed(*_):
+    """Log a heat or fan change while recording."""
+    control = CONTROL_FIELDS[ctx.triggered_id]
+    value = ctx.triggered[0]["value"]
+    if value is None or not recording.is_set():
+        return dash.no_update
+
+    with data_lock:
+        if not time_recorded:
+            return dash.no_update
+        event_time = time_recorded[-1]
+        event_temp = temp_recorded[-1]
+    event_log.add(control, event_time, event_temp, float(value))
+    logging.info("%s set to %s at %s", control, value, event_time)
+    return f"{control} {value:g} at {event_time:%H:%M:%S}"
+
+
 @callback(
     Output("record-data-switch", "on", allow_duplicate=True),
     Input("interval-component", "n_intervals"),
     State("record-data-switch", "on"),
     prevent_initial_call=True
 )
+@profile_callback
 def check_buffer_and_force_stop(n_intervals, current_switch_state):
     if force_stop_recording.is_set():
         logging.info("Force stop event seen. Turning off record switch.")
@@ -164,10 +349,10 @@ def check_buffer_and_force_stop(n_intervals, current_switch_state):
 
 def write_data_to_db(bean_info: str | None):
     """Write temp_recorded and time_recorded to database."""
-    global roast_event_markers
-
     data_to_write = {}
     with data_lock:
+        # Events belong to this recording even when it has no samples to save
+        data_to_write["events"] = event_log.drain()
         if not temp_recorded:
             logging.warning("No data was found to be written to database.")
             return
@@ -175,38 +360,72 @@ def write_data_to_db(bean_info: str | None):
         # Quickly copy data and clear originals inside the lock
         data_to_write["temp"] = list(temp_recorded)
         data_to_write["time"] = list(time_recorded)
-        data_to_write["markers"] = roast_event_markers
+        data_to_write["detected"] = crack_detector.detected_event()
 
         temp_recorded.clear()
         time_recorded.clear()
-        roast_event_markers = initialize_roast_event_markers()
 
-    logging.info("Writing %s data points to database...", len(data_to_write["temp"]))
+    events = data_to_write["events"]
+    if data_to_write["detected"]:
+        detected_time, detected_temp = data_to_write["detected"]
+        events.append(
+            {"type": DETECTED_FIRST_CRACK, "time": detected_time, "temp": detected_temp, "value": None}
+        )
+    save_roast(data_to_write["time"], data_to_write["temp"], events, bean_info)
+    if journal_sink is not None:
+        journal_sink.discard()
+
+
+def save_roast(
+    times: list[datetime.datetime], temps: list[float], events: list[dict], bean_info: str | None
+) -> None:
+    """Store a recorded roast and its events."""
+    logging.info("Writing %s data points to database...", len(temps))
     with next(get_db()) as db:
-        crack_info = prep_crack_data(data_to_write["markers"], data_to_write["time"][0])
+        crack_info = prep_crack_data(events, times[0])
+        elapsed_seconds = datetimes_to_elapsed_seconds(times)
+        features = compute_features(elapsed_seconds, temps)
 
         new_roast = Roast(
-            start_time=data_to_write["time"][0],
-            sec_from_start=json.dumps(datetimes_to_elapsed_seconds(data_to_write["time"])),
-            temperature_f=json.dumps(data_to_write["temp"]),
+            start_time=times[0],
+            sec_from_start=json.dumps(elapsed_seconds),
+            temperature_f=json.dumps(temps),
+            features=None if features is None else encode_features(features),
+            sparkline=compute_sparkline(elapsed_seconds, temps),
             bean_info=bean_info,
             first_crack_start_time=crack_info[0],
             first_crack_start_temp=crack_info[1],
             second_crack_start_time=crack_info[2],
             second_crack_start_temp=crack_info[3],
+            detected_first_crack_time=crack_info[4],
+            detected_first_crack_temp=crack_info[5],
         )
         logging.debug(new_roast)
         db.add(new_roast)
+        db.flush()
+        write_events(db, new_roast.id, times[0], events)
         db.commit()
 
 
-def prep_crack_data(events: dict, start_time: datetime.datetime) -> list[float]:
-    """Prep crack data to write to db."""
+def recover_journal(path: str) -> None:
+    """Save a recording left in the journal by a crash or power loss as a new roast."""
+    times, temps = read_journal(path)
+    if times:
+        logging.warning("Recovering %s unsaved samples from %s", len(temps), path)
+        save_roast(times, temps, [], "Recovered from journal")
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def prep_crack_data(events: list[dict], start_time: datetime.datetime) -> list[float]:
+    """Prep crack data for the legacy Roast columns."""
     output = []
-    for event in ["1st-crack-start_button", "2nd-crack-start_button"]:
-        temp, t = events[event]["data"]
-        delta_t = (t - start_time).total_seconds() if t else None
-        output.extend([delta_t, temp])
+    for event_type in ["1st Crack Start", "2nd Crack Start", DETECTED_FIRST_CRACK]:
+        event = first_event(events, event_type)
+        if event is None:
+            output.extend([None, None])
+        else:
+            output.extend([(event["time"] - start_time).total_seconds(), event["temp"]])
 
     return output
 
@@ -250,6 +469,7 @@ def initialize_deques(num: int, maxlen: int) -> list[collections.deque]:
 
 layout = html.Div([
     dcc.Graph(id="live-update-graph"),
+    dcc.Store(id="latency-trace"),
     dcc.Interval(
         id="interval-component",
         interval=1000,
@@ -266,6 +486,9 @@ layout = html.Div([
                         labelPosition="top"
                     ),
                     html.P("°F", id="current-temp"),
+                    html.P("", id="reference-delta"),
+                    html.P("", id="crack-forecast"),
+                    html.P("", id="latency-readout"),
                 ],
                 className="switch-container"
             ),
@@ -281,6 +504,27 @@ layout = html.Div([
                 ],
                 id="roast-stage-container",
             ),
+            html.Div(
+                [
+                    dcc.Input(
+                        id=control_input_id(control),
+                        type="number",
+                        min=0,
+                        max=100,
+                        debounce=True,
+                        placeholder=f"{control} %",
+                    )
+                    for control in CONTROL_INPUTS
+                ]
+                + [html.P("", id="control-log")],
+                id="control-input-container",
+                className="switch-container",
+            ),
+            dcc.Dropdown(
+                id="reference-roast-dropdown",
+                options=get_reference_roast_options(),
+                placeholder="Follow a reference roast",
+            ),
             dcc.Textarea(
                 id="bean-info",
                 placeholder="Enter bean information",
@@ -292,24 +536,62 @@ layout = html.Div([
 ])
 
 
-temp_recorded, time_recorded = initialize_deques(2, 60*30)
-temp_plot, time_plot = initialize_deques(2, PLOT_WINDOW_SEC)
+# Sampling faster than the sensor converts only repeats readings. Worked out
+# from config, since the sampler thread opens the sensor itself.
+fast_interval = SAMPLE_FAST_INTERVAL
+if pi and not REPLAY_SOURCE:
+    fast_interval = max(fast_interval, conversion_period(THERMOCOUPLE_AVERAGING, MAINS_HZ))
+
+# Buffers hold a fixed number of samples, so size them for the fastest rate
+temp_recorded, time_recorded = initialize_deques(2, int(RECORDING_MAX_SEC / fast_interval))
+temp_plot, time_plot, trace_plot = initialize_deques(3, int(PLOT_WINDOW_SEC / fast_interval))
 data_lock = threading.Lock()
-recording = threading.Event()
 force_stop_recording = threading.Event()
 
+
+def build_sample_pipeline() -> Pipeline:
+    """Assemble the sampler's processing stages and sinks from config."""
+    stages = [UnitConversion(fahrenheit=True), FaultRejection()]
+    if SPIKE_MAX_JUMP_F:
+        stages.append(SpikeRejection(SPIKE_MAX_JUMP_F))
+    if MEDIAN_WINDOW > 1:
+        stages.append(MedianFilter(MEDIAN_WINDOW))
+    if EMA_ALPHA:
+        stages.append(EmaFilter(EMA_ALPHA))
+    stages.append(RateOfRiseChannel())
+
+    sinks = [
+        PlotBufferSink(data_lock, temp_plot, time_plot, trace_plot),
+        RecordingSink(
+            data_lock, recording, temp_recorded, time_recorded, force_stop_recording,
+            listeners=[reference_tracker.update, crack_detector.update],
+        ),
+        sample_metrics,
+        sampling,
+    ]
+    if journal_sink is not None:
+        sinks.append(journal_sink)
+    return Pipeline(stages, sinks)
+
+
+sample_metrics = MetricsSink()
+journal_sink = None
+if RECORDING_JOURNAL_PATH:
+    # A journal that is still there holds a roast that was never saved
+    recover_journal(RECORDING_JOURNAL_PATH)
+    journal_sink = JournalSink(RECORDING_JOURNAL_PATH, recording)
+sampling = AdaptiveSampling(recording, fast_interval, SAMPLE_IDLE_INTERVAL, SAMPLE_FAST_ROR)
+sample_pipeline = build_sample_pipeline()
+
+thermocouple, clock = None, None
+if REPLAY_SOURCE:
+    logging.info("Replaying %s at %sx speed.", REPLAY_SOURCE, REPLAY_SPEEDUP)
+    thermocouple, clock = initialize_replay(REPLAY_SOURCE, REPLAY_SPEEDUP)
+
 temperature_thread = threading.Thread(
     target=continually_read_temperature,
-    args=(
-        data_lock,
-        temp_plot,
-        time_plot,
-        temp_recorded,
-        time_recorded,
-        recording,
-        force_stop_recording,
-        pi,
-    ),
+    args=(sample_pipeline, pi, sampling.next_interval),
+    kwargs={"thermocouple": thermocouple, "clock": clock, "wake": sampling.wake},
     daemon=True,
 )
 temperature_thread.start()
@@ -1,29 +1,130 @@
 """Page to view saved data."""
 
 import dash
-from dash import html, dcc, callback, Output, Input, State, ALL, MATCH, ctx
-from models import Roast, get_db
+from dash import html, dcc, callback, Output, Input, State, ALL, MATCH, Patch, ctx
+from sqlalchemy import case, literal, or_
 
-from utils.plot_utils import create_temperature_plot, convert_all_roasts_to_dicts
+from models import Roast, RoastEvent, get_db
+
+from utils.aggregate_utils import cached_aggregate
+from utils.archive_utils import compact_segments
+from utils.figure_utils import figure_cache, load_roast_dicts, selection_key
+from utils.plot_utils import create_aggregate_plot, create_temperature_plot
+from utils.profile_utils import profile_callback
+from utils.similarity_utils import feature_index
+from utils.sparkline_utils import sparkline_svg, start_sparkline_backfill
 
 dash.register_page(__name__)
 
 # Constants for plotting (can be moved to utils/temp_utils if shared)
 FAHRENHEIT_DISPLAY = True # Assuming historical data is stored/displayed in Fahrenheit
 Y_PADDING = 5
+NUM_SIMILAR = 5
+DTW_SHORTLIST = 20
+
+
+# Only the columns needed for sidebar labels, so listing roasts never loads curves
+OPTION_COLUMNS = (Roast.id, Roast.start_time, Roast.roaster, Roast.bean_info, Roast.tags, Roast.sparkline)
+# Only the columns shown in the roast info panel
+INFO_COLUMNS = (Roast.id, Roast.start_time, Roast.bean_info, Roast.tasting_comments)
 
 
 def get_historical_roasts_options() -> list[dict]:
     """Queries the database for historical roasts and returns options for dcc.Checklist."""
-    options = []
     with next(get_db()) as db:
-        roasts = db.query(Roast).order_by(Roast.start_time.desc()).all()
-        for roast in roasts:
-            label = f"{roast.start_time.strftime('%Y-%m-%d %H:%M')}"
-            if roast.bean_info:
-                label += f" - {roast.bean_info[:10]}"
-            options.append({"label": label, "value": roast.id})
-    return options
+        roasts = db.query(*OPTION_COLUMNS).order_by(Roast.start_time.desc()).all()
+    return [roast_option(roast) for roast in roasts]
+
+
+def roast_option(roast) -> dict:
+    """Checklist option with the roast's sparkline in front of its label."""
+    label = roast_label(roast)
+    if roast.sparkline:
+        label = html.Span([html.Img(src=sparkline_svg(roast.sparkline), className="sparkline"), label])
+    return {"label": label, "value": roast.id}
+
+
+def roast_label(roast: Roast) -> str:
+    """Sidebar label for a roast."""
+    label = f"{roast.start_time.strftime('%Y-%m-%d %H:%M')}"
+    if roast.roaster:
+        label = f"[{roast.roaster}] {label}"
+    if roast.bean_info:
+        label += f" - {roast.bean_info[:10]}"
+    if roast.tags:
+        label += "".join(f" #{tag}" for tag in roast.tags.split())
+    return label
+
+
+def bulk_update(roast_ids: list[int], values: dict) -> None:
+    """Apply column values to several roasts in one UPDATE, bumping their data version."""
+    with next(get_db()) as db:
+        db.query(Roast).filter(Roast.id.in_(roast_ids)).update(
+            {**values, Roast.data_version: Roast.data_version + 1}, synchronize_session=False
+        )
+        db.commit()
+    figure_cache.clear()
+
+
+def bulk_add_tag(roast_ids: list[int], tag: str) -> None:
+    """Add a tag to several roasts in one UPDATE, skipping roasts that already have it."""
+    untagged = or_(Roast.tags.is_(None), Roast.tags == "")
+    with next(get_db()) as db:
+        db.query(Roast).filter(
+            Roast.id.in_(roast_ids),
+            or_(untagged, ~(literal(" ") + Roast.tags + " ").contains(f" {tag} ", autoescape=True)),
+        ).update(
+            {
+                Roast.tags: case((untagged, tag), else_=Roast.tags + " " + tag),
+                Roast.data_version: Roast.data_version + 1,
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+    figure_cache.clear()
+
+
+def bulk_delete(roast_ids: list[int]) -> None:
+    """Delete several roasts and their events in one transaction, then their archived curves."""
+    with next(get_db()) as db:
+        segments = {
+            name for name, in db.query(Roast.archive_segment).filter(
+                Roast.id.in_(roast_ids), Roast.archive_segment.is_not(None)
+            ).distinct()
+        }
+        db.query(RoastEvent).filter(RoastEvent.roast_id.in_(roast_ids)).delete(synchronize_session=False)
+        db.query(Roast).filter(Roast.id.in_(roast_ids)).delete(synchronize_session=False)
+        db.commit()
+    if segments:
+        compact_segments(segments)
+    figure_cache.clear()
+    feature_index.invalidate()
+
+
+def patch_options(options: list[dict], roast_ids: list[int], deleted: bool = False) -> Patch:
+    """Patch the sidebar options for changed or deleted roasts instead of rebuilding them."""
+    roast_ids = set(roast_ids)
+    positions = [i for i, option in enumerate(options) if option["value"] in roast_ids]
+    patched = Patch()
+    if deleted:
+        for i in reversed(positions):
+            del patched[i]
+        return patched
+
+    with next(get_db()) as db:
+        labels = {
+            roast.id: roast_option(roast)["label"]
+            for roast in db.query(*OPTION_COLUMNS).filter(Roast.id.in_(roast_ids))
+        }
+    # Back to front, so removing an option does not shift the ones still to patch
+    for i in reversed(positions):
+        label = labels.get(options[i]["value"])
+        if label is None:
+            # Deleted by another client since this page loaded its options
+            del patched[i]
+        else:
+            patched[i]["label"] = label
+    return patched
 
 
 def create_historical_temperature_plot(roasts_data: list[dict]):
@@ -31,7 +132,7 @@ def create_historical_temperature_plot(roasts_data: list[dict]):
     Creates a Plotly figure for historical roast data.
     Args:
         roasts_data: A list of dicts, where each dict contains:
-            {'id', 'start_time', 'bean_info', 'time_data', 'temp_data', 'event_markers'}
+            {'id', 'start_time', 'bean_info', 'time_data', 'temp_data', 'events'}
             'time_data' here are already datetime objects.
     """
     fig = create_temperature_plot(roasts_data, realtime=False)
@@ -39,6 +140,33 @@ def create_historical_temperature_plot(roasts_data: list[dict]):
     return dcc.Graph(id="historical-roast-plot", figure=fig)
 
 
+def create_aggregate_temperature_plot(selection: tuple, align_first_crack: bool):
+    """Plot percentile bands across the selected (roast id, data version) pairs."""
+    aggregate = cached_aggregate(selection, align_first_crack)
+    if not aggregate["num_roasts"]:
+        return html.H1("No roasts with a first crack marker to align")
+
+    fig = create_aggregate_plot(aggregate, align_first_crack)
+    caption = f"{aggregate['num_roasts']} roasts"
+    if aggregate["skipped"]:
+        caption += f", {aggregate['skipped']} without first crack skipped"
+    return html.Div([
+        html.P(caption),
+        dcc.Graph(id="historical-roast-plot", figure=fig),
+    ])
+
+
+def load_roast_info(roast_ids: list[int]) -> list[dict]:
+    """Roast info panel fields, ordered by start time, without loading curves."""
+    with next(get_db()) as db:
+        rows = (
+            db.query(*INFO_COLUMNS)
+            .filter(Roast.id.in_(roast_ids))
+            .order_by(Roast.start_time.asc()).all()
+        )
+    return [row._asdict() for row in rows]
+
+
 def gather_roast_info(roasts_data: list[dict]) -> list:
     """Gather roast info to display below the plot."""
     all_roast_data = []
@@ -50,6 +178,12 @@ def gather_roast_info(roasts_data: list[dict]) -> list:
                 html.Div(
                     [
                         html.H3(roast["start_time"]),
+                        html.Img(
+                            src="assets/document_search.svg",
+                            id={"type": "similar-icon", "index": roast_id},
+                            className="icon-button",
+                            title="Find similar roasts",
+                        ),
                         html.Img(
                             src="assets/trash.svg",
                             id={"type": "delete-icon", "index": roast_id},
@@ -103,26 +237,32 @@ def gather_roast_info(roasts_data: list[dict]) -> list:
     Output("historical-plot", "children"),
     Output("roast-info-container", "children"),
     Input("historical-roasts-checklist", "value"),
+    Input("plot-mode", "value"),
+    Input("align-first-crack", "value"),
     prevent_initial_call=True,
 )
-def update_historical_plot(selected_roast_ids: list[int]):
+@profile_callback
+def update_historical_plot(selected_roast_ids: list[int], plot_mode: str, align: list[str]):
     """Update the historical roast plot based on selected roast IDs."""
     if not selected_roast_ids:
         return default_plot_message, []
 
-    with next(get_db()) as db:
-        # Fetch selected roasts, ordered by start time for consistent plotting
-        selected_roasts = (
-            db.query(Roast)
-            .filter(Roast.id.in_(selected_roast_ids))
-            .order_by(Roast.start_time.asc()).all()
-        )
+    key = selection_key(selected_roast_ids, plot_mode, bool(align))
+    return figure_cache.get(("page",) + key, lambda: build_historical_plot(key))
+
+
+def build_historical_plot(key: tuple) -> tuple:
+    """Build the plot and roast info for a selection key from `selection_key`."""
+    selection, _, plot_mode, align = key
+    roast_ids = [roast_id for roast_id, _ in selection]
 
-    roast_dicts = convert_all_roasts_to_dicts(selected_roasts)
-    plot = create_historical_temperature_plot(roast_dicts)
-    roast_info = gather_roast_info(roast_dicts)
+    if plot_mode == "aggregate":
+        # The aggregate reads curves itself, so only the info panel fields are loaded here
+        return create_aggregate_temperature_plot(selection, align), gather_roast_info(load_roast_info(roast_ids))
 
-    return plot, roast_info
+    # Selected roasts, ordered by start time for consistent plotting
+    roast_dicts = load_roast_dicts(roast_ids)
+    return create_historical_temperature_plot(roast_dicts), gather_roast_info(roast_dicts)
 
 
 @callback(
@@ -130,8 +270,11 @@ def update_historical_plot(selected_roast_ids: list[int]):
     Input("refresh-history", "n_clicks"),
     prevent_initial_call=True,
 )
+@profile_callback
 def refresh_history(_):
     """Refresh historical options on button click."""
+    # Roasts ingested since startup get their sparklines by a later refresh
+    start_sparkline_backfill()
     return get_historical_roasts_options()
 
 
@@ -140,9 +283,11 @@ def refresh_history(_):
     Input({'type': 'update-bean-info', 'index': ALL}, 'n_clicks'),
     State({'type': 'bean-info-textarea', 'index': ALL}, 'value'),
     State({'type': 'bean-info-textarea', 'index': ALL}, 'id'),
+    State("historical-roasts-checklist", "options"),
     prevent_initial_call=True
 )
-def update_bean_info(n_clicks, text_values, text_ids):
+@profile_callback
+def update_bean_info(n_clicks, text_values, text_ids, options):
     """Update bean info for a roast."""
     if not ctx.triggered_id:
         return dash.no_update
@@ -157,13 +302,8 @@ def update_bean_info(n_clicks, text_values, text_ids):
             new_bean_info = text_values[i]
             break
 
-    with next(get_db()) as db:
-        roast_to_update = db.query(Roast).filter(Roast.id == roast_id_to_update).first()
-        if roast_to_update:
-            roast_to_update.bean_info = new_bean_info
-            db.commit()
-
-    return get_historical_roasts_options()
+    bulk_update([roast_id_to_update], {Roast.bean_info: new_bean_info})
+    return patch_options(options, [roast_id_to_update])
 
 
 @callback(
@@ -172,6 +312,7 @@ def update_bean_info(n_clicks, text_values, text_ids):
     State({"type": "tasting-notes-textarea", "index": MATCH}, "value"),
     prevent_initial_call=True
 )
+@profile_callback
 def update_tasting_comments(n_clicks, new_notes):
     """Update tasting notes for a roast."""
     if not ctx.triggered_id:
@@ -183,7 +324,9 @@ def update_tasting_comments(n_clicks, new_notes):
         roast_to_update = db.query(Roast).filter(Roast.id == roast_id_to_update).first()
         if roast_to_update:
             roast_to_update.tasting_comments = new_notes
+            roast_to_update.data_version += 1
             db.commit()
+    figure_cache.clear()
 
     return dash.no_update
 
@@ -191,27 +334,112 @@ def update_tasting_comments(n_clicks, new_notes):
 @callback(
     Output("historical-roasts-checklist", "options", allow_duplicate=True),
     Output("historical-roasts-checklist", "value"),
+    Output("similar-roasts", "children", allow_duplicate=True),
     Input({'type': 'delete-icon', 'index': ALL}, 'n_clicks'),
     State("historical-roasts-checklist", "value"),
+    State("historical-roasts-checklist", "options"),
     prevent_initial_call=True
 )
-def delete_roast(n_clicks, selected_roast_ids):
+@profile_callback
+def delete_roast(n_clicks, selected_roast_ids, options):
     """Delete a roast record."""
     if not any(n_clicks):
-        return dash.no_update, dash.no_update
+        return dash.no_update, dash.no_update, dash.no_update
 
     roast_id_to_delete = ctx.triggered_id["index"]
-
-    with next(get_db()) as db:
-        roast_to_delete = db.query(Roast).filter(Roast.id == roast_id_to_delete).first()
-        if roast_to_delete:
-            db.delete(roast_to_delete)
-            db.commit()
+    bulk_delete([roast_id_to_delete])
 
     # Remove the deleted ID from the list of selected values
     new_selected_ids = [id for id in selected_roast_ids if id != roast_id_to_delete]
 
-    return get_historical_roasts_options(), new_selected_ids
+    # The similar-roasts list may offer the deleted roast
+    return patch_options(options, [roast_id_to_delete], deleted=True), new_selected_ids, []
+
+
+@callback(
+    Output("historical-roasts-checklist", "options", allow_duplicate=True),
+    Output("historical-roasts-checklist", "value", allow_duplicate=True),
+    Output("similar-roasts", "children", allow_duplicate=True),
+    Input("bulk-set-bean-info", "n_clicks"),
+    Input("bulk-add-tag", "n_clicks"),
+    Input("bulk-delete", "submit_n_clicks"),
+    State("bulk-text", "value"),
+    State("historical-roasts-checklist", "value"),
+    State("historical-roasts-checklist", "options"),
+    prevent_initial_call=True
+)
+@profile_callback
+def bulk_edit_roasts(_set_clicks, _tag_clicks, _delete_clicks, text, selected_roast_ids, options):
+    """Set bean info, tag or delete every selected roast at once."""
+    if not selected_roast_ids:
+        return dash.no_update, dash.no_update, dash.no_update
+
+    if ctx.triggered_id == "bulk-delete":
+        bulk_delete(selected_roast_ids)
+        return patch_options(options, selected_roast_ids, deleted=True), [], []
+
+    if ctx.triggered_id == "bulk-add-tag":
+        tag = "-".join((text or "").split())
+        if not tag:
+            return dash.no_update, dash.no_update, dash.no_update
+        bulk_add_tag(selected_roast_ids, tag)
+    else:
+        bulk_update(selected_roast_ids, {Roast.bean_info: text or None})
+
+    # Re-send the selection so the plot and roast info pick up the new values
+    return patch_options(options, selected_roast_ids), selected_roast_ids, dash.no_update
+
+
+@callback(
+    Output("similar-roasts", "children"),
+    Input({"type": "similar-icon", "index": ALL}, "n_clicks"),
+    prevent_initial_call=True,
+)
+@profile_callback
+def find_similar_roasts(n_clicks):
+    """List the roasts most similar to the clicked one."""
+    if not any(n_clicks):
+        return dash.no_update
+
+    roast_id = ctx.triggered_id["index"]
+    matches = feature_index.query(roast_id, k=NUM_SIMILAR, dtw_shortlist=DTW_SHORTLIST)
+    if not matches:
+        return [html.P("No similar roasts found.")]
+
+    with next(get_db()) as db:
+        roasts = {
+            roast.id: roast for roast in
+            db.query(Roast).filter(Roast.id.in_([match_id for match_id, _ in matches]))
+        }
+        labels = {match_id: roast_label(roast) for match_id, roast in roasts.items()}
+
+    return [html.H4(f"Similar to #{roast_id}")] + [
+        html.Div(
+            f"{labels[match_id]} ({distance:.1f})",
+            id={"type": "similar-roast", "index": match_id},
+            className="similar-roast",
+            n_clicks=0,
+        )
+        for match_id, distance in matches if match_id in labels
+    ]
+
+
+@callback(
+    Output("historical-roasts-checklist", "value", allow_duplicate=True),
+    Input({"type": "similar-roast", "index": ALL}, "n_clicks"),
+    State("historical-roasts-checklist", "value"),
+    prevent_initial_call=True,
+)
+@profile_callback
+def select_similar_roast(n_clicks, selected_roast_ids):
+    """Add a similar roast to the plotted selection."""
+    if not any(n_clicks):
+        return dash.no_update
+
+    roast_id = ctx.triggered_id["index"]
+    if roast_id in selected_roast_ids:
+        return dash.no_update
+    return selected_roast_ids + [roast_id]
 
 
 default_plot_message = html.H1("Select data to see plot")
@@ -229,6 +457,20 @@ sidebar = html.Div(
             ],
             className="div-with-icon",
         ),
+        dcc.RadioItems(
+            id="plot-mode",
+            options=[
+                {"label": "Overlay", "value": "overlay"},
+                {"label": "Aggregate", "value": "aggregate"},
+            ],
+            value="overlay",
+            inline=True,
+        ),
+        dcc.Checklist(
+            id="align-first-crack",
+            options=[{"label": "Align on first crack", "value": "align"}],
+            value=[],
+        ),
         dcc.Loading(
             id="loading",
             type="dot",
@@ -243,6 +485,24 @@ sidebar = html.Div(
                 ]
             )
         ),
+        html.Div(
+            [
+                dcc.Input(
+                    id="bulk-text",
+                    type="text",
+                    placeholder="Bean info or tag for selected roasts",
+                ),
+                html.Button("Set bean info", id="bulk-set-bean-info"),
+                html.Button("Add tag", id="bulk-add-tag"),
+                dcc.ConfirmDialogProvider(
+                    html.Button("Delete selected"),
+                    id="bulk-delete",
+                    message="Delete all selected roasts?",
+                ),
+            ],
+            className="bulk-actions",
+        ),
+        html.Div([], id="similar-roasts"),
     ],
     className="database-entries-container"
 )
@@ -0,0 +1,105 @@
+import math
+import types
+
+import pytest
+
+from utils import max31856_utils
+from utils.max31856_utils import FakeMax31856Spi, Max31856, conversion_period
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def no_sleep(seconds):
+    raise AssertionError(f"Driver slept for {seconds} s")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # The driver reads time.monotonic for the first conversion deadline
+    monkeypatch.setattr(max31856_utils, "time", types.SimpleNamespace(monotonic=clock, sleep=no_sleep))
+    return clock
+
+
+def make_sensor(clock, averaging=1, mains_hz=60, temperature=25.0):
+    device = FakeMax31856Spi(temperature=temperature, clock=clock)
+    return Max31856(device, averaging, mains_hz), device
+
+
+def test_no_reading_before_first_conversion(clock):
+    sensor, device = make_sensor(clock)
+    transactions = device.transactions
+
+    clock.advance(sensor.conversion_sec * 0.9)
+    assert math.isnan(sensor.temperature)
+    # Nothing is read from the chip until a conversion can have finished
+    assert device.transactions == transactions
+
+    clock.advance(sensor.conversion_sec * 0.2)
+    assert sensor.temperature == pytest.approx(25.0, abs=0.01)
+
+
+def test_read_is_one_transaction_without_waiting(clock):
+    sensor, device = make_sensor(clock)
+    clock.advance(sensor.conversion_sec * 1.5)
+    start = clock()
+    for _ in range(100):
+        transactions = device.transactions
+        sensor.temperature
+        assert device.transactions == transactions + 1
+    # Reads never wait for the clock to move
+    assert clock() == start
+
+
+@pytest.mark.parametrize("averaging, mains_hz", [(1, 60), (4, 60), (16, 50)])
+def test_fresh_conversion_cadence(clock, averaging, mains_hz):
+    sensor, device = make_sensor(clock, averaging, mains_hz, temperature=lambda sec: 20.0 + sec)
+    period = conversion_period(averaging, mains_hz)
+    assert sensor.conversion_sec == pytest.approx(period)
+
+    seconds, step = 5.0, 0.005
+    readings = []
+    for _ in range(round(seconds / step)):
+        clock.advance(step)
+        temp = sensor.temperature
+        if not math.isnan(temp) and (not readings or temp != readings[-1]):
+            readings.append(temp)
+
+    # Polling much faster than the chip converts only yields new values per conversion
+    assert len(readings) == pytest.approx(seconds / period, abs=1)
+    assert device.conversions == pytest.approx(seconds / period, abs=1)
+    assert readings == sorted(readings)
+
+
+@pytest.mark.parametrize("status, names, valid", [
+    (0x01, ["open_circuit"], False),
+    (0x02, ["over_under_voltage"], False),
+    (0x40, ["tc_range"], False),
+    (0x80, ["cj_range"], False),
+    (0x08, ["tc_high"], True),
+    (0x14, ["cj_low", "tc_low"], True),
+])
+def test_fault_bits(clock, status, names, valid):
+    sensor, device = make_sensor(clock)
+    clock.advance(sensor.conversion_sec)
+    assert sensor.temperature == pytest.approx(25.0, abs=0.01)
+    assert sensor.faults == []
+
+    device.status = status
+    temp = sensor.temperature
+    assert sensor.faults == names
+    # Threshold alarms keep the reading, faults that break the conversion do not
+    assert math.isnan(temp) != valid
+
+    device.status = 0
+    assert sensor.temperature == pytest.approx(25.0, abs=0.01)
+    assert sensor.faults == []
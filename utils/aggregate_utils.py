@@ -0,0 +1,85 @@
+"""Summarize many roasts as mean, median and percentile bands on a common grid."""
+
+import functools
+
+import numpy as np
+
+from models import Roast, get_db
+from utils.archive_utils import load_curves
+
+AGGREGATE_GRID_MIN = 0.05  # 3 second grid
+AGGREGATE_PERCENTILES = (10, 25, 75, 90)
+# Only what aggregation reads, so events and other columns are never loaded
+AGGREGATE_COLUMNS = (Roast.id, Roast.sec_from_start, Roast.temperature_f, Roast.archive_segment, Roast.first_crack_start_time)
+
+
+def aggregate_roasts(roasts_data: list[dict], align_first_crack: bool = False) -> dict:
+    """
+    Interpolate roasts onto a common time grid and compute summary curves.
+
+    Args:
+        roasts_data: Dicts with "time_data" (minutes), "temp_data" and
+            "first_crack_start_time" (minutes), e.g. from `convert_object_to_dict`.
+        align_first_crack: Shift each roast so first crack is at t=0. Roasts
+            without a first crack marker are skipped.
+
+    Returns:
+        {"time_data", "mean", "median", "count", "percentiles": {p: curve}, "num_roasts", "skipped"}
+    """
+    curves = []
+    skipped = 0
+    for roast in roasts_data:
+        offset = 0.0
+        if align_first_crack:
+            if roast["first_crack_start_time"] is None:
+                skipped += 1
+                continue
+            offset = roast["first_crack_start_time"]
+        curves.append((np.asarray(roast["time_data"]) - offset, np.asarray(roast["temp_data"])))
+
+    if not curves:
+        return {"num_roasts": 0, "skipped": skipped}
+
+    start = min(t[0] for t, _ in curves)
+    end = max(t[-1] for t, _ in curves)
+    grid = np.linspace(start, end, int((end - start) / AGGREGATE_GRID_MIN) + 1)
+
+    temps = np.full((len(curves), len(grid)), np.nan)
+    for i, (t, y) in enumerate(curves):
+        temps[i] = np.interp(grid, t, y, left=np.nan, right=np.nan)
+
+    count = np.sum(~np.isnan(temps), axis=0)
+    bands = np.nanpercentile(temps, [50, *AGGREGATE_PERCENTILES], axis=0)
+    return {
+        "time_data": grid,
+        "mean": np.nanmean(temps, axis=0),
+        "median": bands[0],
+        "count": count,
+        "percentiles": dict(zip(AGGREGATE_PERCENTILES, bands[1:])),
+        "num_roasts": len(curves),
+        "skipped": skipped,
+    }
+
+
+def aggregate_input(row) -> dict:
+    """Curve and first crack of a roast row, in minutes."""
+    sec_data, temp_data = load_curves(row)
+    first_crack = row.first_crack_start_time
+    return {
+        "time_data": [sec / 60 for sec in sec_data],
+        "temp_data": temp_data,
+        "first_crack_start_time": first_crack / 60 if first_crack else first_crack,
+    }
+
+
+@functools.lru_cache(maxsize=16)
+def cached_aggregate(selection: tuple[tuple[int, int], ...], align_first_crack: bool) -> dict:
+    """
+    Aggregate a selection of (roast id, data version) pairs, as in `selection_key`.
+
+    Edited roasts have a new version, so they never hit a stale entry.
+    """
+    roast_ids = [roast_id for roast_id, _ in selection]
+    with next(get_db()) as db:
+        rows = db.query(*AGGREGATE_COLUMNS).filter(Roast.id.in_(roast_ids)).all()
+    return aggregate_roasts([aggregate_input(row) for row in rows], align_first_crack)
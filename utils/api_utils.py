@@ -0,0 +1,257 @@
+"""
+Read-only JSON API for roasts on the Flask server.
+
+    GET /api/roasts?fields=summary&limit=50&cursor=<next_cursor>&since=2025-01-01&roaster=pi-2
+    GET /api/roasts/<id>?fields=curves&start=60&end=600&max_points=200
+    GET /api/roasts/<id>/samples?start=60&end=600&max_points=200
+
+`fields` is "summary" (default), "curves" (summary plus curves) or a comma
+separated list of field names. Roasts are listed newest start time first;
+pass the returned `next_cursor` as `cursor` for the next page. `start`/`end`
+(seconds from roast start) slice the curves and `max_points` decimates them.
+Malformed arguments get a 400.
+
+The roast list is streamed. Responses are encoded with orjson when it is installed (the `api`
+extra, `uv sync --extra api`).
+"""
+
+import datetime
+import json
+import math
+
+import numpy as np
+from flask import Response, jsonify, request, stream_with_context
+from sqlalchemy import and_, or_
+
+from models import Roast, get_db
+from utils.archive_utils import load_curves
+from utils.export_utils import CURVE_FIELDS, SCALAR_FIELDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SUMMARY_FIELDS = SCALAR_FIELDS
+ALL_FIELDS = SUMMARY_FIELDS + CURVE_FIELDS
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 100
+
+
+def dumps(obj) -> bytes:
+    """Encode JSON with orjson if available. NaN and infinity become null either way."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(finite_or_none(obj), default=json_default, separators=(",", ":")).encode()
+
+
+def finite_or_none(value):
+    """Replace NaN and infinity with None, as orjson does, since JSON has no token for them."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, np.ndarray):
+        return finite_or_none(value.tolist())
+    if isinstance(value, dict):
+        return {key: finite_or_none(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [finite_or_none(item) for item in value]
+    return value
+
+
+def json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def parse_fields(spec: str | None) -> list[str]:
+    """Field names for a `fields` argument. Raises ValueError on unknown fields."""
+    if not spec or spec == "summary":
+        return SUMMARY_FIELDS
+    if spec == "curves":
+        return ALL_FIELDS
+    fields = [field.strip() for field in spec.split(",") if field.strip()]
+    unknown = set(fields) - set(ALL_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+
+def parse_arg(name: str, parse, default=None):
+    """
+    Parse a query argument, or return `default` if it is absent.
+
+    Raises ValueError naming the argument when it is malformed, since Flask's
+    `type=` would silently drop it instead.
+    """
+    value = request.args.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return parse(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value!r}") from None
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"{number} is not positive")
+    return number
+
+
+def parse_cursor(value: str) -> tuple[datetime.datetime, int]:
+    """(start time, id) of the last roast on the previous page."""
+    start_time, roast_id = value.rsplit(",", 1)
+    return datetime.datetime.fromisoformat(start_time), int(roast_id)
+
+
+def format_cursor(start_time: datetime.datetime, roast_id: int) -> str:
+    return f"{start_time.isoformat()},{roast_id}"
+
+
+def query_columns(fields: list[str]) -> list:
+    """Columns to select so curves are only read when asked for."""
+    columns = [getattr(Roast, field) for field in fields if field not in CURVE_FIELDS]
+    if any(field in CURVE_FIELDS for field in fields):
+        columns += [Roast.sec_from_start, Roast.temperature_f, Roast.archive_segment]
+    return columns
+
+
+def slice_curve(
+    sec_data: list[float],
+    temp_data: list[float],
+    start: float | None = None,
+    end: float | None = None,
+    max_points: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Cut a curve to [start, end] seconds and keep at most max_points evenly spaced samples."""
+    sec = np.asarray(sec_data, dtype=np.float64)
+    temp = np.asarray(temp_data, dtype=np.float64)
+    lo = np.searchsorted(sec, start, side="left") if start is not None else 0
+    hi = np.searchsorted(sec, end, side="right") if end is not None else len(sec)
+    sec, temp = sec[lo:hi], temp[lo:hi]
+
+    if max_points and len(sec) > max_points:
+        keep = np.unique(np.linspace(0, len(sec) - 1, max_points).round().astype(np.int64))
+        sec, temp = sec[keep], temp[keep]
+    return sec, temp
+
+
+def roast_to_json(row, fields: list[str], curve_args: dict) -> dict:
+    """Project a query row onto the requested fields."""
+    result = {field: getattr(row, field) for field in fields if field not in CURVE_FIELDS}
+    if any(field in CURVE_FIELDS for field in fields):
+        sec, temp = slice_curve(*load_curves(row), **curve_args)
+        curves = {"sec_from_start": sec, "temperature_f": temp}
+        for field in CURVE_FIELDS:
+            if field in fields:
+                result[field] = curves[field]
+    return result
+
+
+def curve_args_from_request() -> dict:
+    """Curve slicing arguments. Raises ValueError if one is malformed."""
+    return {
+        "start": parse_arg("start", float),
+        "end": parse_arg("end", float),
+        "max_points": parse_arg("max_points", positive_int),
+    }
+
+
+def stream_roast_list(
+    fields: list[str],
+    curve_args: dict,
+    filters: dict,
+    cursor: tuple[datetime.datetime, int] | None,
+    limit: int,
+):
+    """Yield a roast page as JSON chunks, STREAM_BATCH_SIZE roasts at a time."""
+    with next(get_db()) as db:
+        # Ordered by start time, with id breaking ties, so the cursor needs both
+        query = db.query(*query_columns(fields), Roast.start_time.label("cursor_start_time"))
+        if cursor is not None:
+            start_time, roast_id = cursor
+            query = query.filter(or_(
+                Roast.start_time < start_time,
+                and_(Roast.start_time == start_time, Roast.id < roast_id),
+            ))
+        if filters["since"]:
+            query = query.filter(Roast.start_time >= filters["since"])
+        if filters["until"]:
+            query = query.filter(Roast.start_time < filters["until"])
+        if filters["roaster"]:
+            query = query.filter(Roast.roaster == filters["roaster"])
+        if filters["bean"]:
+            query = query.filter(Roast.bean_info.contains(filters["bean"], autoescape=True))
+
+        yield b'{"roasts":['
+        count, last = 0, None
+        query = query.order_by(Roast.start_time.desc(), Roast.id.desc())
+        for row in query.limit(limit).yield_per(STREAM_BATCH_SIZE):
+            yield (b"," if count else b"") + dumps(roast_to_json(row, fields, curve_args))
+            count += 1
+            last = row
+
+    next_cursor = format_cursor(last.cursor_start_time, last.id) if count == limit else None
+    yield b'],"next_cursor":' + dumps(next_cursor) + b"}"
+
+
+def register_api_routes(server) -> None:
+    """Add the read-only /api/roasts endpoints to the Flask server."""
+    @server.route("/api/roasts")
+    def list_roasts():
+        try:
+            fields = parse_fields(request.args.get("fields"))
+            filters = {
+                "since": parse_arg("since", datetime.datetime.fromisoformat),
+                "until": parse_arg("until", datetime.datetime.fromisoformat),
+                "roaster": request.args.get("roaster"),
+                "bean": request.args.get("bean"),
+            }
+            cursor = parse_arg("cursor", parse_cursor)
+            limit = min(parse_arg("limit", positive_int, DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+            curve_args = curve_args_from_request()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return Response(
+            stream_with_context(stream_roast_list(fields, curve_args, filters, cursor, limit)),
+            mimetype="application/json",
+        )
+
+    @server.route("/api/roasts/<int:roast_id>")
+    def get_roast(roast_id: int):
+        try:
+            fields = parse_fields(request.args.get("fields"))
+            curve_args = curve_args_from_request()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        with next(get_db()) as db:
+            row = db.query(*query_columns(fields)).filter(Roast.id == roast_id).first()
+            if row is None:
+                return jsonify({"error": f"Roast {roast_id} not found"}), 404
+            body = dumps(roast_to_json(row, fields, curve_args))
+        return Response(body, mimetype="application/json")
+
+    @server.route("/api/roasts/<int:roast_id>/samples")
+    def get_samples(roast_id: int):
+        try:
+            curve_args = curve_args_from_request()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        with next(get_db()) as db:
+            row = db.query(*query_columns(["id"] + CURVE_FIELDS)).filter(Roast.id == roast_id).first()
+            if row is None:
+                return jsonify({"error": f"Roast {roast_id} not found"}), 404
+            sec, temp = slice_curve(*load_curves(row), **curve_args)
+
+        body = dumps({"id": roast_id, "count": len(sec), "sec_from_start": sec, "temperature_f": temp})
+        return Response(body, mimetype="application/json")
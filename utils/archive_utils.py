@@ -0,0 +1,240 @@
+"""
+Move the curves of old roasts out of SQLite into compressed, read-only archive segments.
+
+A segment file is a header, one zlib-compressed block per roast (packed float32
+seconds followed by packed float32 temperatures) and a JSON offset index. Roast
+rows stay in the database with their metadata and `archive_segment` set, so the
+history page still lists them. Curves are read back through `load_curves`,
+which memory-maps the segment. Deleting archived roasts rewrites their segments
+without them, or removes a segment once none of its roasts remain.
+
+    python -m utils.archive_utils --older-than-days 365 --vacuum
+"""
+
+import argparse
+import datetime
+import functools
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+from sqlalchemy import text
+
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_DIR, MAINTENANCE_HOUR
+from models import Roast, engine, get_db
+
+SEGMENT_MAGIC = b"ROASTARC"
+HEADER = struct.Struct("<8sQQ")  # magic, index offset, index length
+ARCHIVE_BATCH_SIZE = 200
+MAINTENANCE_CHECK_SEC = 15 * 60
+
+# Compaction rewrites segments in place, so only one may run at a time
+_compact_lock = threading.Lock()
+
+
+class ArchiveSegment:
+    """Read-only, memory-mapped archive segment."""
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = HEADER.unpack_from(self.map, 0)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"{path} is not a roast archive segment.")
+        self.index = json.loads(self.map[index_offset:index_offset + index_length])
+
+    def read(self, roast_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return (seconds, temperatures) for a roast."""
+        offset, length, count = self.index[str(roast_id)]
+        values = np.frombuffer(zlib.decompress(self.map[offset:offset + length]), dtype="<f4")
+        return values[:count], values[count:]
+
+
+@functools.lru_cache(maxsize=8)
+def open_segment(name: str) -> ArchiveSegment:
+    """Open a segment by file name, keeping recently used segments mapped."""
+    return ArchiveSegment(os.path.join(ARCHIVE_DIR, name))
+
+
+def load_curves(roast: Roast) -> tuple[list[float], list[float]]:
+    """(seconds from start, temperatures in °F) for a roast, archived or not."""
+    if roast.archive_segment:
+        sec_data, temp_data = open_segment(roast.archive_segment).read(roast.id)
+        return sec_data.tolist(), temp_data.tolist()
+    return json.loads(roast.sec_from_start), json.loads(roast.temperature_f)
+
+
+def load_curve_json(roast: Roast) -> tuple[str, str]:
+    """Curves as the JSON text stored in the database, archived or not."""
+    if roast.archive_segment:
+        sec_data, temp_data = load_curves(roast)
+        return json.dumps(sec_data), json.dumps(temp_data)
+    return roast.sec_from_start, roast.temperature_f
+
+
+def write_segment(path: str, roasts: list[Roast]) -> None:
+    """Write roasts' curves to a new segment file and fsync it."""
+    index = {}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(SEGMENT_MAGIC, 0, 0))
+        for roast in roasts:
+            sec_data, temp_data = load_curves(roast)
+            packed = np.concatenate([
+                np.asarray(sec_data, dtype="<f4"), np.asarray(temp_data, dtype="<f4")
+            ]).tobytes()
+            block = zlib.compress(packed, 9)
+            index[str(roast.id)] = [f.tell(), len(block), len(sec_data)]
+            f.write(block)
+
+        index_bytes = json.dumps(index).encode()
+        index_offset = f.tell()
+        f.write(index_bytes)
+        f.seek(0)
+        f.write(HEADER.pack(SEGMENT_MAGIC, index_offset, len(index_bytes)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def archive_old_roasts(older_than_days: float = ARCHIVE_AFTER_DAYS) -> int:
+    """
+    Move curves of roasts older than the threshold into a new segment.
+
+    Returns:
+        The number of roasts archived.
+    """
+    from utils.similarity_utils import backfill_features
+
+    # Features are computed from curves, so make sure they exist first
+    backfill_features()
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archived = 0
+    with next(get_db()) as db:
+        while True:
+            roasts = (
+                db.query(Roast)
+                .filter(Roast.start_time < cutoff, Roast.archive_segment.is_(None))
+                .order_by(Roast.id.asc())
+                .limit(ARCHIVE_BATCH_SIZE)
+                .all()
+            )
+            if not roasts:
+                break
+
+            name = f"segment-{datetime.datetime.now():%Y%m%d-%H%M%S}-{roasts[0].id}.bin"
+            write_segment(os.path.join(ARCHIVE_DIR, name), roasts)
+            for roast in roasts:
+                roast.archive_segment = name
+                roast.sec_from_start = ""
+                roast.temperature_f = ""
+            db.commit()
+            archived += len(roasts)
+            logging.info("Archived %s roasts to %s", len(roasts), name)
+    return archived
+
+
+def list_segments() -> set[str]:
+    """Names of the segment files in ARCHIVE_DIR."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return set()
+    return {name for name in os.listdir(ARCHIVE_DIR) if name.startswith("segment-") and name.endswith(".bin")}
+
+
+def compact_segments(names: set[str] | None = None) -> int:
+    """
+    Drop the curves of deleted roasts from archive segments.
+
+    A segment with none of its roasts left is removed, one with some left is
+    rewritten with just those. Checks every segment if `names` is None.
+
+    Returns:
+        The number of segments rewritten or removed.
+    """
+    changed = 0
+    with _compact_lock, next(get_db()) as db:
+        for name in sorted(list_segments() if names is None else names):
+            path = os.path.join(ARCHIVE_DIR, name)
+            if not os.path.exists(path):
+                continue
+            roasts = db.query(Roast).filter(Roast.archive_segment == name).order_by(Roast.id.asc()).all()
+            if not roasts:
+                os.remove(path)
+                logging.info("Removed archive segment %s, none of its roasts remain.", name)
+            elif len(roasts) < len(open_segment(name).index):
+                write_segment(path, roasts)
+                logging.info("Rewrote archive segment %s with its %s remaining roasts.", name, len(roasts))
+            else:
+                continue
+            changed += 1
+    if changed:
+        # Mapped segments still show the old files
+        open_segment.cache_clear()
+    return changed
+
+
+def vacuum_database() -> None:
+    """Return free pages to the file system."""
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        auto_vacuum = connection.execute(text("PRAGMA auto_vacuum")).scalar()
+        if auto_vacuum == 2:  # INCREMENTAL
+            connection.execute(text("PRAGMA incremental_vacuum"))
+        else:
+            connection.execute(text("VACUUM"))
+    logging.info("Database vacuumed.")
+
+
+def continually_maintain(recording: threading.Event, older_than_days: float, hour: int) -> None:
+    """Archive and vacuum once a day at `hour`, skipping it while a roast is being recorded."""
+    last_run = None
+    while True:
+        now = datetime.datetime.now()
+        if now.hour == hour and last_run != now.date() and not recording.is_set():
+            try:
+                archived = archive_old_roasts(older_than_days)
+                # Catches roasts deleted outside the history page too
+                compacted = compact_segments()
+                if (archived or compacted) and not recording.is_set():
+                    vacuum_database()
+            except Exception as e:
+                logging.error("Archive maintenance failed: %s", e)
+            last_run = now.date()
+        time.sleep(MAINTENANCE_CHECK_SEC)
+
+
+def start_maintenance(recording: threading.Event) -> threading.Thread | None:
+    """Start the nightly archive thread, unless archiving is disabled."""
+    if not ARCHIVE_AFTER_DAYS:
+        return None
+    thread = threading.Thread(
+        target=continually_maintain,
+        args=(recording, ARCHIVE_AFTER_DAYS, MAINTENANCE_HOUR),
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive curves of old roasts.")
+    parser.add_argument("--older-than-days", type=float, default=ARCHIVE_AFTER_DAYS or 365)
+    parser.add_argument("--vacuum", action="store_true", help="Vacuum the database afterwards.")
+    args = parser.parse_args()
+
+    count = archive_old_roasts(args.older_than_days)
+    logging.info("Archived %s roasts.", count)
+    if args.vacuum:
+        vacuum_database()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
@@ -0,0 +1,145 @@
+"""Online first crack forecasting and onset detection."""
+
+import datetime
+import math
+import threading
+
+FIRST_CRACK_TEMP_F = 400.0
+ROR_TREND_HALF_LIFE_SEC = 90.0
+ONSET_WINDOW_F = 10.0  # Start looking for onset this far below FIRST_CRACK_TEMP_F
+ONSET_ROR_DROP = 1.5  # °F/min below the RoR trend that counts as a stall
+ONSET_STALL_SEC = 5.0  # How long RoR must stay stalled to flag onset
+MIN_TREND_SEC = 30.0  # Seconds of RoR history before forecasting
+
+
+class CrackDetector:
+    """
+    Forecast time to first crack and flag its likely onset, one sample at a time.
+
+    RoR comes from the pipeline's "ror" channel (RateOfRiseChannel). Its
+    trend is an exponentially weighted linear fit of RoR over
+    time, kept as decayed running sums so each update is O(1). The forecast
+    extrapolates temperature along that trend. Onset is flagged when the
+    temperature is near first crack and RoR stalls below the trend. Stalled
+    samples are left out of the fit, so the trend does not follow the stall down.
+    """
+    def __init__(self, target_temp: float = FIRST_CRACK_TEMP_F, half_life_sec: float = ROR_TREND_HALF_LIFE_SEC):
+        self.target_temp = target_temp
+        self.half_life_sec = half_life_sec
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the current roast."""
+        with self.lock:
+            self.start = None
+            self.last_sec = None
+            self.sums = [0.0] * 5  # weight, t, r, t*t, t*r
+            self.trend_start: float | None = None
+            self.stalled_since: float | None = None
+            self.eta_sec: float | None = None
+            self.detected: tuple[float, float] | None = None  # (seconds from start, temp)
+
+    def update(self, temp: float, reading_time: datetime.datetime, channels: dict) -> None:
+        """Add a recorded sample with its pipeline channels."""
+        with self.lock:
+            if self.start is None:
+                self.start = reading_time
+            sec = (reading_time - self.start).total_seconds()
+            ror = channels.get("ror")
+            if ror is None:
+                return
+
+            if self.trend_start is None:
+                self.trend_start = sec
+            if sec - self.trend_start < MIN_TREND_SEC:
+                self.fit(sec, ror)
+                return
+
+            trend_ror, slope = self.trend(sec)
+            near_crack = self.detected is None and temp >= self.target_temp - ONSET_WINDOW_F
+            stalling = near_crack and ror < trend_ror - ONSET_ROR_DROP
+            if not stalling:
+                self.fit(sec, ror)
+            self.eta_sec = forecast_seconds(self.target_temp - temp, trend_ror, slope)
+
+            if near_crack:
+                # Sample rate varies with adaptive sampling, so the stall is timed rather than counted
+                if not stalling:
+                    self.stalled_since = None
+                elif self.stalled_since is None:
+                    self.stalled_since = sec
+                if self.stalled_since is not None and sec - self.stalled_since >= ONSET_STALL_SEC:
+                    self.detected = (sec, temp)
+
+    def fit(self, sec: float, ror: float) -> None:
+        """Decay and update the weighted regression sums of RoR over time."""
+        if self.last_sec is not None:
+            decay = 0.5 ** ((sec - self.last_sec) / self.half_life_sec)
+            self.sums = [s * decay for s in self.sums]
+        self.last_sec = sec
+
+        t = sec / 60
+        for i, value in enumerate((1.0, t, ror, t * t, t * ror)):
+            self.sums[i] += value
+
+    def trend(self, sec: float) -> tuple[float, float]:
+        """Fitted RoR (°F/min) at sec and its slope (°F/min²)."""
+        w, st, sr, stt, str_ = self.sums
+        denominator = w * stt - st * st
+        if denominator <= 1e-9:
+            return sr / w, 0.0
+        slope = (w * str_ - st * sr) / denominator
+        intercept = (sr - slope * st) / w
+        return intercept + slope * sec / 60, slope
+
+    def readout(self) -> str:
+        """Forecast text for the live page."""
+        with self.lock:
+            if self.detected is not None:
+                sec, temp = self.detected
+                return f"1st crack likely at {format_seconds(sec)} ({temp:.0f} °F)"
+            if self.eta_sec is None:
+                return ""
+            return f"1st crack in ~{format_seconds(self.eta_sec)}"
+
+    def detected_event(self) -> tuple[datetime.datetime, float] | None:
+        """Wall-clock time and temperature of the detected onset."""
+        with self.lock:
+            if self.detected is None:
+                return None
+            sec, temp = self.detected
+            return self.start + datetime.timedelta(seconds=sec), temp
+
+
+def forecast_seconds(delta_temp: float, ror: float, slope: float) -> float | None:
+    """
+    Seconds until the temperature rises by delta_temp, if RoR follows its trend.
+
+    A falling RoR is extrapolated as an exponential decay with the current
+    relative rate k = -slope/ror, which matches the flattening of a roast curve:
+    delta_temp = ror/k * (1 - exp(-k*t)). A flat or rising RoR is extrapolated
+    linearly: delta_temp = ror*t + slope*t²/2. Returns None if the trend never gets there.
+    """
+    if delta_temp <= 0:
+        return 0.0
+    if ror <= 0:
+        return None
+
+    if slope < 0:
+        k = -slope / ror
+        remaining = 1 - delta_temp * k / ror
+        if remaining <= 0:
+            return None
+        minutes = -math.log(remaining) / k
+    elif slope < 1e-6:
+        minutes = delta_temp / ror
+    else:
+        minutes = (-ror + math.sqrt(ror * ror + 2 * slope * delta_temp)) / slope
+    return minutes * 60
+
+
+def format_seconds(sec: float) -> str:
+    """Format seconds as m:ss."""
+    minutes, seconds = divmod(int(round(sec)), 60)
+    return f"{minutes}:{seconds:02d}"
@@ -0,0 +1,112 @@
+"""Timestamped roast events and control-input changes."""
+
+import collections
+import datetime
+import threading
+
+from sqlalchemy import insert
+
+from models import Roast, RoastEvent, get_db
+
+DETECTED_FIRST_CRACK = "Detected 1st Crack"
+
+# Events that are also kept as columns on Roast, for roasts stored before the
+# event table existed and for queries such as first crack alignment
+LEGACY_EVENT_COLUMNS = {
+    "1st Crack Start": "first_crack_start",
+    "2nd Crack Start": "second_crack_start",
+    DETECTED_FIRST_CRACK: "detected_first_crack",
+}
+
+
+class EventLog:
+    """
+    Events logged during the current roast.
+
+    Events stay in memory until the roast is saved, then go to the database
+    in one batched insert with it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+
+    def add(self, event_type: str, reading_time: datetime.datetime, temp: float, value: float | None = None) -> None:
+        with self.lock:
+            self.events.append({"type": event_type, "time": reading_time, "temp": temp, "value": value})
+
+    def has(self, event_type: str) -> bool:
+        with self.lock:
+            return any(event["type"] == event_type for event in self.events)
+
+    def snapshot(self) -> list[dict]:
+        with self.lock:
+            return list(self.events)
+
+    def drain(self) -> list[dict]:
+        """Return all events and start a new log."""
+        with self.lock:
+            events, self.events = self.events, []
+        return events
+
+
+def first_event(events: list[dict], event_type: str) -> dict | None:
+    """First event of a type, or None."""
+    return next((event for event in events if event["type"] == event_type), None)
+
+
+def write_events(db, roast_id: int, start_time: datetime.datetime, events: list[dict]) -> None:
+    """Insert a roast's events in one executemany. The caller commits."""
+    rows = [
+        {
+            "roast_id": roast_id,
+            "t": (event["time"] - start_time).total_seconds(),
+            "event_type": event["type"],
+            "temp": event["temp"],
+            "value": event["value"],
+        }
+        for event in events
+    ]
+    if rows:
+        db.execute(insert(RoastEvent), rows)
+
+
+def load_events(roasts: list[Roast]) -> dict[int, list[dict]]:
+    """
+    Events for each roast in time order, with "time" in seconds from start.
+
+    One query covers every roast. Legacy event columns fill in any event type
+    the table has no row for.
+    """
+    events = collections.defaultdict(list)
+    if roasts:
+        with next(get_db()) as db:
+            rows = (
+                db.query(RoastEvent)
+                .filter(RoastEvent.roast_id.in_([roast.id for roast in roasts]))
+                .order_by(RoastEvent.roast_id, RoastEvent.t)
+                .all()
+            )
+        for row in rows:
+            events[row.roast_id].append(
+                {"type": row.event_type, "time": row.t, "temp": row.temp, "value": row.value}
+            )
+
+    for roast in roasts:
+        logged = {event["type"] for event in events[roast.id]}
+        for event_type, column in LEGACY_EVENT_COLUMNS.items():
+            event_time = getattr(roast, f"{column}_time")
+            event_temp = getattr(roast, f"{column}_temp")
+            if event_type in logged or event_time is None or event_temp is None:
+                continue
+            events[roast.id].append(
+                {"type": event_type, "time": event_time, "temp": event_temp, "value": None}
+            )
+        events[roast.id].sort(key=lambda event: event["time"])
+    return events
+
+
+def event_label(event: dict) -> str:
+    """Marker text, with the setting for control inputs."""
+    if event["value"] is None:
+        return event["type"]
+    return f"{event['type']} {event['value']:g}"
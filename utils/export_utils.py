@@ -0,0 +1,319 @@
+"""
+Export roasts to CSV, Parquet or Arrow IPC files, and import them back.
+
+Both directions stream in batches, so memory stays bounded no matter how many
+roasts are in the database or the file. Each roast carries its tags and its
+roast_events rows (an `events` column, JSON text in CSV). Parquet and Arrow
+need the `export` extra (`uv sync --extra export`).
+
+    python -m utils.export_utils export roasts.parquet --since 2025-01-01 --bean Ethiopia
+    python -m utils.export_utils import roasts.parquet --roaster old-pi
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import logging
+import os
+import sys
+
+from sqlalchemy import insert
+
+from models import Roast, RoastEvent, get_db
+from utils.archive_utils import load_curve_json
+from utils.sparkline_utils import sparkline_from_json
+
+EXPORT_BATCH_SIZE = 200
+IMPORT_TRANSACTION_ROWS = 2000
+
+SCALAR_FIELDS = [
+    "id",
+    "start_time",
+    "bean_info",
+    "first_crack_start_time",
+    "first_crack_start_temp",
+    "second_crack_start_time",
+    "second_crack_start_temp",
+    "detected_first_crack_time",
+    "detected_first_crack_temp",
+    "tasting_comments",
+    "tags",
+    "roaster",
+    "source_id",
+]
+CURVE_FIELDS = ["sec_from_start", "temperature_f"]
+EVENT_FIELDS = ["t", "event_type", "temp", "value"]
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+
+def detect_format(path: str) -> str:
+    """Pick the file format from the extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unknown format for {path}, use one of {', '.join(FORMATS)}")
+    return FORMATS[ext]
+
+
+def query_roasts(db, since=None, until=None, bean=None, roaster=None, roast_ids=None):
+    """Filtered roast query in id order."""
+    query = db.query(Roast)
+    if since:
+        query = query.filter(Roast.start_time >= since)
+    if until:
+        query = query.filter(Roast.start_time < until)
+    if bean:
+        query = query.filter(Roast.bean_info.contains(bean, autoescape=True))
+    if roaster:
+        query = query.filter(Roast.roaster == roaster)
+    if roast_ids:
+        query = query.filter(Roast.id.in_(roast_ids))
+    return query.order_by(Roast.id.asc())
+
+
+def iter_roast_batches(**filters):
+    """Yield lists of export rows, EXPORT_BATCH_SIZE roasts at a time."""
+    with next(get_db()) as db:
+        batch = []
+        for roast in query_roasts(db, **filters).yield_per(EXPORT_BATCH_SIZE):
+            row = {key: getattr(roast, key) for key in SCALAR_FIELDS}
+            row["sec_from_start"], row["temperature_f"] = load_curve_json(roast)
+            batch.append(row)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield add_events(db, batch)
+                batch = []
+        if batch:
+            yield add_events(db, batch)
+
+
+def add_events(db, batch: list[dict]) -> list[dict]:
+    """Attach each roast's event rows, with one query per batch."""
+    events = {row["id"]: [] for row in batch}
+    for event in (
+        db.query(RoastEvent)
+        .filter(RoastEvent.roast_id.in_(events))
+        .order_by(RoastEvent.roast_id, RoastEvent.t)
+    ):
+        events[event.roast_id].append({key: getattr(event, key) for key in EVENT_FIELDS})
+    for row in batch:
+        row["events"] = events[row["id"]]
+    return batch
+
+
+def arrow_schema():
+    """Arrow schema for exported roasts. Curves are list<float64> columns."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("start_time", pa.timestamp("us")),
+        ("bean_info", pa.string()),
+        ("first_crack_start_time", pa.float64()),
+        ("first_crack_start_temp", pa.float64()),
+        ("second_crack_start_time", pa.float64()),
+        ("second_crack_start_temp", pa.float64()),
+        ("detected_first_crack_time", pa.float64()),
+        ("detected_first_crack_temp", pa.float64()),
+        ("tasting_comments", pa.string()),
+        ("tags", pa.string()),
+        ("roaster", pa.string()),
+        ("source_id", pa.int64()),
+        ("sec_from_start", pa.list_(pa.float64())),
+        ("temperature_f", pa.list_(pa.float64())),
+        ("events", pa.list_(pa.struct([
+            ("t", pa.float64()),
+            ("event_type", pa.string()),
+            ("temp", pa.float64()),
+            ("value", pa.float64()),
+        ]))),
+    ])
+
+
+def export_roasts(path: str, **filters) -> int:
+    """Stream matching roasts to a file. Returns the number exported."""
+    fmt = detect_format(path)
+    count = 0
+
+    if fmt == "csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SCALAR_FIELDS + CURVE_FIELDS + ["events"])
+            writer.writeheader()
+            for batch in iter_roast_batches(**filters):
+                for row in batch:
+                    row["events"] = json.dumps(row["events"])
+                writer.writerows(batch)
+                count += len(batch)
+        return count
+
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    schema = arrow_schema()
+    if fmt == "parquet":
+        writer = pa.parquet.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+    with writer:
+        for batch in iter_roast_batches(**filters):
+            for row in batch:
+                for key in CURVE_FIELDS:
+                    row[key] = json.loads(row[key])
+            table = pa.Table.from_pylist(batch, schema=schema)
+            writer.write_table(table)
+            count += len(batch)
+    return count
+
+
+def iter_file_batches(path: str):
+    """Yield lists of row dicts from an export file, one batch at a time."""
+    fmt = detect_format(path)
+
+    if fmt == "csv":
+        csv.field_size_limit(sys.maxsize)
+        with open(path, newline="") as f:
+            batch = []
+            for row in csv.DictReader(f):
+                batch.append(parse_csv_row(row))
+                if len(batch) >= EXPORT_BATCH_SIZE:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        return
+
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    if fmt == "parquet":
+        for record_batch in pyarrow.parquet.ParquetFile(path).iter_batches(EXPORT_BATCH_SIZE):
+            yield record_batch.to_pylist()
+    else:
+        with pyarrow.memory_map(path) as source:
+            reader = pyarrow.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i).to_pylist()
+
+
+def parse_csv_row(row: dict) -> dict:
+    """Convert CSV strings back to typed values."""
+    parsed = {}
+    for key, value in row.items():
+        if value == "":
+            parsed[key] = None
+        elif key == "start_time":
+            parsed[key] = datetime.datetime.fromisoformat(value)
+        elif key in ("id", "source_id"):
+            parsed[key] = int(value)
+        elif key == "events":
+            parsed[key] = json.loads(value)
+        elif key.endswith(("_time", "_temp")):
+            parsed[key] = float(value)
+        else:
+            parsed[key] = value
+    return parsed
+
+
+def import_roasts(path: str, roaster: str | None = None) -> int:
+    """
+    Bulk insert roasts from an export file. Returns the number of roasts inserted.
+
+    Imported roasts get new ids. With `roaster`, each roast keeps its original
+    id as source_id, so importing the same file twice does not duplicate rows.
+    Files exported before tags and events were added import without them.
+    """
+    read, inserted = 0, 0
+    pending = 0
+    with next(get_db()) as db:
+        for batch in iter_file_batches(path):
+            rows, events = [], []
+            for row in batch:
+                row = dict(row)
+                source_id = row.pop("id")
+                if roaster and row.get("roaster") is None:
+                    row["roaster"] = roaster
+                    row["source_id"] = source_id
+                for key in CURVE_FIELDS:
+                    if not isinstance(row[key], str):
+                        row[key] = json.dumps(row[key])
+                row["sparkline"] = sparkline_from_json(row["sec_from_start"], row["temperature_f"])
+                events.append(row.pop("events", None) or [])
+                rows.append(row)
+            read += len(rows)
+
+            rows, events = skip_existing(db, rows, events)
+            if rows:
+                # Ids come back in row order, so each roast's events can follow it
+                roast_ids = db.scalars(insert(Roast).returning(Roast.id, sort_by_parameter_order=True), rows).all()
+                event_rows = [
+                    {"roast_id": roast_id, **event}
+                    for roast_id, roast_events in zip(roast_ids, events)
+                    for event in roast_events
+                ]
+                if event_rows:
+                    db.execute(insert(RoastEvent), event_rows)
+            inserted += len(rows)
+            pending += len(rows)
+            if pending >= IMPORT_TRANSACTION_ROWS:
+                db.commit()
+                pending = 0
+        db.commit()
+    if read > inserted:
+        logging.info("Skipped %s roasts that were already stored.", read - inserted)
+    return inserted
+
+
+def skip_existing(db, rows: list[dict], events: list[list]) -> tuple[list[dict], list[list]]:
+    """Drop rows whose (roaster, source_id) is already stored or repeated in the batch."""
+    keyed = [(row.get("roaster"), row.get("source_id")) for row in rows]
+    source_ids = {source_id for roaster, source_id in keyed if roaster is not None and source_id is not None}
+    seen = set()
+    if source_ids:
+        seen = {
+            (row.roaster, row.source_id) for row in
+            db.query(Roast.roaster, Roast.source_id).filter(Roast.source_id.in_(source_ids))
+        }
+
+    kept_rows, kept_events = [], []
+    for key, row, roast_events in zip(keyed, rows, events):
+        if None not in key:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept_rows.append(row)
+        kept_events.append(roast_events)
+    return kept_rows, kept_events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export roasts to a file.")
+    export_parser.add_argument("path", help="Output file (.csv, .parquet or .arrow).")
+    export_parser.add_argument("--since", type=datetime.datetime.fromisoformat)
+    export_parser.add_argument("--until", type=datetime.datetime.fromisoformat)
+    export_parser.add_argument("--bean", help="Only roasts whose bean info contains this text.")
+    export_parser.add_argument("--roaster", help="Only roasts uploaded by this roaster.")
+    export_parser.add_argument("--ids", type=int, nargs="+", dest="roast_ids")
+
+    import_parser = subparsers.add_parser("import", help="Import roasts from a file.")
+    import_parser.add_argument("path", help="Input file (.csv, .parquet or .arrow).")
+    import_parser.add_argument("--roaster", help="Record local roasts in the file as coming from this roaster.")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        count = export_roasts(
+            args.path, since=args.since, until=args.until, bean=args.bean,
+            roaster=args.roaster, roast_ids=args.roast_ids,
+        )
+        logging.info("Exported %s roasts to %s", count, args.path)
+    else:
+        count = import_roasts(args.path, roaster=args.roaster)
+        logging.info("Imported %s roasts from %s", count, args.path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
@@ -0,0 +1,130 @@
+"""
+Cache of rendered history figures.
+
+Entries are keyed by the sorted roast ids, display units, plot mode and the
+`data_version` of every selected roast. Editing a roast bumps its version and
+deleting it drops it from the key, and roast ids are never reused
+(AUTOINCREMENT), so stale entries are never served. Edits and deletes on the
+history page also clear the cache to free them right away.
+
+    GET /api/figure?ids=3,7,12&mode=overlay&align=0
+"""
+
+import collections
+import hashlib
+import threading
+
+from flask import jsonify, request
+
+from config import FIGURE_CACHE_SIZE
+from models import Roast, get_db
+from utils.aggregate_utils import cached_aggregate
+from utils.plot_utils import (
+    FAHRENHEIT_DISPLAY, convert_all_roasts_to_dicts, create_aggregate_plot, create_temperature_plot
+)
+
+
+class FigureCache:
+    """Thread-safe LRU cache holding at most `maxsize` entries."""
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, build):
+        """Return the cached value for key, calling build() on a miss."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = build()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+def selection_key(roast_ids: list[int], plot_mode: str, align_first_crack: bool) -> tuple:
+    """Cache key for a history selection, including each roast's data version."""
+    with next(get_db()) as db:
+        versions = (
+            db.query(Roast.id, Roast.data_version)
+            .filter(Roast.id.in_(roast_ids))
+            .order_by(Roast.id.asc()).all()
+        )
+    return (
+        tuple((roast_id, version) for roast_id, version in versions),
+        "F" if FAHRENHEIT_DISPLAY else "C",
+        plot_mode,
+        align_first_crack and plot_mode == "aggregate",
+    )
+
+
+def etag(key: tuple) -> str:
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def load_roast_dicts(roast_ids: list[int]) -> list[dict]:
+    """Selected roasts as plot dicts, ordered by start time."""
+    with next(get_db()) as db:
+        roasts = (
+            db.query(Roast)
+            .filter(Roast.id.in_(roast_ids))
+            .order_by(Roast.start_time.asc()).all()
+        )
+    return convert_all_roasts_to_dicts(roasts)
+
+
+def history_figure(selection: tuple, plot_mode: str, align_first_crack: bool):
+    """
+    Overlay or aggregate figure for the (roast id, data version) pairs of a
+    selection key, None if there is nothing to plot.
+    """
+    if plot_mode == "aggregate":
+        aggregate = cached_aggregate(selection, align_first_crack)
+        if not aggregate["num_roasts"]:
+            return None
+        return create_aggregate_plot(aggregate, align_first_crack)
+    return create_temperature_plot(load_roast_dicts([roast_id for roast_id, _ in selection]), realtime=False)
+
+
+def register_figure_routes(server) -> None:
+    """Add the /api/figure endpoint to the Flask server."""
+    @server.route("/api/figure")
+    def figure():
+        try:
+            roast_ids = [int(roast_id) for roast_id in request.args.get("ids", "").split(",") if roast_id]
+        except ValueError:
+            return jsonify({"error": "ids must be a comma separated list of integers"}), 400
+        plot_mode = request.args.get("mode", "overlay")
+        align = request.args.get("align", default=0, type=int) == 1
+
+        key = selection_key(roast_ids, plot_mode, align)
+        tag = etag(key)
+        if request.if_none_match.contains(tag):
+            return "", 304, {"ETag": f'"{tag}"'}
+
+        def build():
+            fig = history_figure(key[0], plot_mode, align)
+            return fig.to_json() if fig is not None else None
+
+        body = figure_cache.get(("json",) + key, build)
+        if body is None:
+            return jsonify({"error": "Nothing to plot for this selection"}), 404
+        response = server.response_class(body, mimetype="application/json")
+        response.set_etag(tag)
+        return response
+
+
+figure_cache = FigureCache(FIGURE_CACHE_SIZE)
@@ -0,0 +1,247 @@
+"""
+Upload roasts from roaster nodes to a central instance.
+
+Each node keeps its own database as the local buffer and periodically pushes
+gzip-compressed batches of new roasts to the central server's /api/ingest
+endpoint. Batches carry a per-node sequence number. The pending batch is
+saved before sending and resent unchanged until acknowledged, and the server
+ignores sequence numbers it has already stored, so retries are idempotent.
+
+Stand-in central server for testing:
+    ROAST_DATABASE_URL=sqlite:///data/central.db python -m utils.ingest_utils --port 8060
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+
+from flask import Flask, jsonify, request
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from config import (
+    INGEST_BATCH_SIZE,
+    INGEST_PERIOD_SEC,
+    INGEST_STATE_PATH,
+    ROASTER_NAME,
+)
+from models import Base, IngestBatch, Roast, RoastEvent, engine, get_db
+from utils.archive_utils import load_curve_json
+from utils.sparkline_utils import sparkline_from_json
+
+ROAST_FIELDS = [
+    "start_time",
+    "sec_from_start",
+    "temperature_f",
+    "bean_info",
+    "first_crack_start_time",
+    "first_crack_start_temp",
+    "second_crack_start_time",
+    "second_crack_start_temp",
+    "detected_first_crack_time",
+    "detected_first_crack_temp",
+    "tasting_comments",
+    "tags",
+]
+EVENT_FIELDS = ["t", "event_type", "temp", "value"]
+
+
+def load_state(path: str = INGEST_STATE_PATH) -> dict:
+    """Load the uploader state, or a fresh state if none was saved."""
+    if not os.path.exists(path):
+        return {"next_seq": 1, "last_acked_id": 0, "pending": None}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state: dict, path: str = INGEST_STATE_PATH) -> None:
+    """Atomically save the uploader state."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def roast_to_payload(roast: Roast, events: list[RoastEvent]) -> dict:
+    """Serialize a roast and its event rows for upload. Curves are sent as their stored JSON text."""
+    payload = {key: getattr(roast, key) for key in ROAST_FIELDS}
+    payload["sec_from_start"], payload["temperature_f"] = load_curve_json(roast)
+    payload["id"] = roast.id
+    payload["start_time"] = roast.start_time.isoformat()
+    payload["events"] = [{key: getattr(event, key) for key in EVENT_FIELDS} for event in events]
+    return payload
+
+
+def next_batch(state: dict, batch_size: int = INGEST_BATCH_SIZE) -> dict | None:
+    """Return the pending batch, or assign a new one from roasts not yet acknowledged."""
+    if state["pending"]:
+        return state["pending"]
+
+    with next(get_db()) as db:
+        roast_ids = [
+            row.id for row in
+            db.query(Roast.id)
+            .filter(Roast.roaster.is_(None), Roast.id > state["last_acked_id"])
+            .order_by(Roast.id.asc())
+            .limit(batch_size)
+        ]
+    if not roast_ids:
+        return None
+
+    state["pending"] = {"seq": state["next_seq"], "roast_ids": roast_ids}
+    save_state(state)
+    return state["pending"]
+
+
+def encode_batch(node: str, seq: int, roast_ids: list[int]) -> bytes:
+    """Build the gzip-compressed JSON body for a batch."""
+    with next(get_db()) as db:
+        roasts = db.query(Roast).filter(Roast.id.in_(roast_ids)).order_by(Roast.id.asc()).all()
+        events = {roast_id: [] for roast_id in roast_ids}
+        for event in (
+            db.query(RoastEvent)
+            .filter(RoastEvent.roast_id.in_(roast_ids))
+            .order_by(RoastEvent.roast_id, RoastEvent.t)
+        ):
+            events[event.roast_id].append(event)
+        body = {
+            "node": node,
+            "seq": seq,
+            "roasts": [roast_to_payload(roast, events[roast.id]) for roast in roasts],
+        }
+    return gzip.compress(json.dumps(body).encode())
+
+
+def upload_pending(base_url: str, node: str = ROASTER_NAME, state: dict | None = None) -> int:
+    """
+    Upload batches until there is nothing left to send.
+
+    Returns:
+        The number of batches acknowledged.
+    """
+    state = state or load_state()
+    acked = 0
+    while batch := next_batch(state):
+        request_ = urllib.request.Request(
+            f"{base_url.rstrip('/')}/api/ingest",
+            data=encode_batch(node, batch["seq"], batch["roast_ids"]),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        with urllib.request.urlopen(request_, timeout=30) as response:
+            reply = json.load(response)
+        if reply.get("ack") != batch["seq"]:
+            raise RuntimeError(f"Unexpected ingest reply: {reply}")
+
+        state["last_acked_id"] = max(batch["roast_ids"])
+        state["next_seq"] = batch["seq"] + 1
+        state["pending"] = None
+        save_state(state)
+        acked += 1
+        logging.info(
+            "Uploaded batch %s with %s roasts (duplicate=%s).",
+            batch["seq"], len(batch["roast_ids"]), reply.get("duplicate", False),
+        )
+    return acked
+
+
+def continually_upload(base_url: str, period: float = INGEST_PERIOD_SEC) -> None:
+    """Upload new roasts every `period` seconds, retrying after failures."""
+    while True:
+        try:
+            upload_pending(base_url)
+        except Exception as e:
+            logging.warning("Upload to %s failed, will retry: %s", base_url, e)
+        time.sleep(period)
+
+
+def start_uploader(base_url: str) -> threading.Thread:
+    """Start the background uploader thread."""
+    thread = threading.Thread(target=continually_upload, args=(base_url,), daemon=True)
+    thread.start()
+    logging.info("Uploading roasts as %s to %s", ROASTER_NAME, base_url)
+    return thread
+
+
+def store_batch(batch: dict) -> dict:
+    """Store an uploaded batch, ignoring sequence numbers and roasts already seen."""
+    node, seq = batch["node"], int(batch["seq"])
+    with next(get_db()) as db:
+        if db.get(IngestBatch, (node, seq)):
+            return {"ack": seq, "duplicate": True, "stored": 0}
+
+        source_ids = [roast["id"] for roast in batch["roasts"]]
+        existing = {
+            row.source_id for row in
+            db.query(Roast.source_id)
+            .filter(Roast.roaster == node, Roast.source_id.in_(source_ids))
+        }
+
+        new_roasts = []
+        for roast in batch["roasts"]:
+            if roast["id"] in existing:
+                continue
+            fields = {key: roast.get(key) for key in ROAST_FIELDS}
+            fields["start_time"] = datetime.datetime.fromisoformat(roast["start_time"])
+            fields["sparkline"] = sparkline_from_json(fields["sec_from_start"], fields["temperature_f"])
+            new_roasts.append((Roast(roaster=node, source_id=roast["id"], **fields), roast.get("events", [])))
+
+        db.add_all([new_roast for new_roast, _ in new_roasts])
+        db.add(IngestBatch(node=node, seq=seq, roast_count=len(new_roasts)))
+        try:
+            # Ids are needed for the event rows
+            db.flush()
+            event_rows = [
+                {"roast_id": new_roast.id, **{key: event.get(key) for key in EVENT_FIELDS}}
+                for new_roast, events in new_roasts
+                for event in events
+            ]
+            if event_rows:
+                db.execute(insert(RoastEvent), event_rows)
+            db.commit()
+        except IntegrityError:
+            # A concurrent retry of the same batch won the race
+            db.rollback()
+            return {"ack": seq, "duplicate": True, "stored": 0}
+
+    return {"ack": seq, "duplicate": False, "stored": len(new_roasts)}
+
+
+def register_ingest_routes(server) -> None:
+    """Add the /api/ingest endpoint to the Flask server."""
+    @server.route("/api/ingest", methods=["POST"])
+    def ingest():
+        try:
+            body = request.get_data()
+            if request.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            batch = json.loads(body)
+            result = store_batch(batch)
+        except (KeyError, TypeError, ValueError, OSError, EOFError) as e:
+            return jsonify({"error": f"Malformed batch: {e}"}), 400
+
+        logging.info("Ingest from %s: %s", batch["node"], result)
+        return jsonify(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in central ingestion server.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8060)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    server = Flask(__name__)
+    register_ingest_routes(server)
+    server.run(host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
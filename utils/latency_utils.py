@@ -0,0 +1,104 @@
+"""
+Sensor-to-screen latency tracing for the live page.
+
+Each live sample carries wall clock stamps through the pipeline and the
+`update_graph_live` response. The browser adds its render time and posts the
+trace back:
+
+    read_at      thermocouple read (sampler thread)
+    buffered_at  appended to the plot buffer (after any lock wait)
+    requested_at update_graph_live started (interval tick)
+    served_at    figure built, response leaving the server
+    rendered_at  browser painted the update (browser clock)
+
+The browser and server clocks must be in sync (NTP) for `rendered_at` to be
+meaningful when the page is viewed from another machine.
+
+    GET /api/latency  p50/p99 of every stage over the recent window
+"""
+
+import collections
+import logging
+import os
+import threading
+
+import numpy as np
+from flask import jsonify, request
+
+from config import LATENCY_LOG_PATH
+
+TRACE_FIELDS = ["read_at", "buffered_at", "requested_at", "served_at", "rendered_at"]
+LATENCY_WINDOW = 600  # Traces kept for the percentiles, 10 minutes at 1 Hz
+
+
+class LatencyTracker:
+    """Recent sensor-to-screen traces with an optional CSV log."""
+    def __init__(self, window: int = LATENCY_WINDOW, log_path: str | None = None):
+        self.lock = threading.Lock()
+        self.traces = collections.deque(maxlen=window)
+        self.log_path = log_path
+        self.log_file = None
+
+    def record(self, trace: dict) -> None:
+        """Store a completed trace. Raises ValueError if a stamp is missing."""
+        stamps = [float(trace[field]) for field in TRACE_FIELDS]
+        if any(later < earlier for earlier, later in zip(stamps, stamps[1:-1])):
+            raise ValueError("Trace stamps are out of order.")
+
+        with self.lock:
+            self.traces.append(stamps)
+            if self.log_path:
+                self.write_log(stamps)
+
+    def write_log(self, stamps: list[float]) -> None:
+        if self.log_file is None:
+            new_file = not os.path.exists(self.log_path)
+            self.log_file = open(self.log_path, "a", buffering=1)
+            if new_file:
+                self.log_file.write(",".join(TRACE_FIELDS) + "\n")
+        self.log_file.write(",".join(f"{stamp:.4f}" for stamp in stamps) + "\n")
+
+    def percentiles(self) -> dict:
+        """p50/p99 seconds for each stage and for the whole trace."""
+        with self.lock:
+            if not self.traces:
+                return {}
+            stamps = np.array(self.traces)
+
+        stages = {
+            f"{earlier}->{later}": stamps[:, i + 1] - stamps[:, i]
+            for i, (earlier, later) in enumerate(zip(TRACE_FIELDS, TRACE_FIELDS[1:]))
+        }
+        stages["total"] = stamps[:, -1] - stamps[:, 0]
+        result = {
+            stage: {"p50": float(np.percentile(values, 50)), "p99": float(np.percentile(values, 99))}
+            for stage, values in stages.items()
+        }
+        result["count"] = len(stamps)
+        return result
+
+    def readout(self) -> str:
+        """Sensor-to-screen latency text for the live page."""
+        total = self.percentiles().get("total")
+        if total is None:
+            return ""
+        return f"Latency p50 {total['p50']:.2f} s, p99 {total['p99']:.2f} s"
+
+
+def register_latency_routes(server) -> None:
+    """Add the /api/latency endpoint to the Flask server."""
+    @server.route("/api/latency", methods=["GET", "POST"])
+    def latency():
+        if request.method == "GET":
+            return jsonify(latency_tracker.percentiles())
+
+        # Posted with navigator.sendBeacon, so the body is JSON without a JSON content type
+        try:
+            latency_tracker.record(request.get_json(force=True))
+        except (KeyError, TypeError, ValueError) as e:
+            logging.debug("Rejected latency trace: %s", e)
+            return jsonify({"error": f"Malformed trace: {e}"}), 400
+        return "", 204
+
+
+latency_tracker = LatencyTracker(log_path=LATENCY_LOG_PATH)
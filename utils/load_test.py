@@ -0,0 +1,347 @@
+"""
+Concurrent-client load test for the Dash callbacks.
+
+Simulates browsers on the live page (`update_graph_live` and
+`check_buffer_and_force_stop` every interval tick) and on the history page
+(`update_historical_plot` with random selections), then reports throughput,
+latency percentiles and sampler jitter.
+
+In-process against a synthetic database and the mock sensor:
+    python -m utils.load_test --clients 8 --duration 30
+Against a running server:
+    python -m utils.load_test --url http://raspberrypi.local:8050 --clients 4
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+LIVE_CALLBACKS = ["live-update-graph.figure", "record-data-switch.on"]
+HISTORY_CALLBACK = "historical-plot.children"
+REFRESH_CALLBACK = "historical-roasts-checklist.options"
+
+
+class HttpTransport:
+    """Send requests to a running server."""
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    def get(self, path: str) -> tuple[int, bytes]:
+        with urllib.request.urlopen(self.base_url + path) as response:
+            return response.status, response.read()
+
+    def post(self, path: str, payload: dict) -> tuple[int, bytes]:
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class InProcessTransport:
+    """Send requests to the app through Flask test clients, one per thread."""
+    def __init__(self, server):
+        self.server = server
+        self.local = threading.local()
+
+    def client(self):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.server.test_client()
+        return self.local.client
+
+    def get(self, path: str) -> tuple[int, bytes]:
+        response = self.client().get(path)
+        return response.status_code, response.data
+
+    def post(self, path: str, payload: dict) -> tuple[int, bytes]:
+        response = self.client().post(path, json=payload)
+        return response.status_code, response.data
+
+
+def seed_database(database_url: str, num_roasts: int) -> None:
+    """Create the schema and fill it with synthetic roasts."""
+    from models import Base, Roast, SessionLocal, engine
+    from utils.replay_utils import synthetic_roast_profile
+
+    assert str(engine.url) == database_url, "models imported before the database URL was set"
+    Base.metadata.create_all(engine)
+
+    with SessionLocal() as db:
+        start = datetime.datetime(2025, 1, 1, 8, 0)
+        for i in range(num_roasts):
+            sec_data, temp_data = synthetic_roast_profile(
+                duration_sec=random.Random(i).uniform(10, 16) * 60, seed=i
+            )
+            db.add(Roast(
+                start_time=start + datetime.timedelta(days=i),
+                sec_from_start=json.dumps(sec_data),
+                temperature_f=json.dumps(temp_data),
+                bean_info=f"Synthetic bean {i % 7}",
+            ))
+        db.commit()
+
+
+def split_outputs(output: str) -> list[dict]:
+    """Split a Dash output spec into output dicts."""
+    if output.startswith(".."):
+        specs = output[2:-2].split("...")
+    else:
+        specs = [output]
+
+    outputs = []
+    for spec in specs:
+        component_id, prop = spec.rsplit(".", 1)
+        outputs.append({"id": component_id, "property": prop})
+    return outputs
+
+
+def find_callbacks(transport) -> dict[str, dict]:
+    """Map the first output (without @hash) of every callback to its dependency spec."""
+    _, body = transport.get("/_dash-dependencies")
+    callbacks = {}
+    for dependency in json.loads(body):
+        if "." not in dependency["output"]:
+            continue  # Callback without outputs, such as a clientside reporting hook
+        first = split_outputs(dependency["output"])[0]
+        key = f"{first['id']}.{first['property'].split('@')[0]}"
+        # Only keep the callback driven by the interval for the record switch
+        if key in callbacks and not any(
+            i["id"] == "interval-component" for i in dependency["inputs"]
+        ):
+            continue
+        callbacks[key] = dependency
+    return callbacks
+
+
+def build_payload(dependency: dict, values: dict) -> dict:
+    """Build a `_dash-update-component` request body for a callback."""
+    def with_values(items):
+        return [
+            {"id": item["id"], "property": item["property"],
+             "value": values.get(f"{item['id']}.{item['property']}")}
+            for item in items
+        ]
+
+    outputs = split_outputs(dependency["output"])
+    inputs = with_values(dependency["inputs"])
+    return {
+        "output": dependency["output"],
+        "outputs": outputs if len(outputs) > 1 else outputs[0],
+        "inputs": inputs,
+        "changedPropIds": [f"{i['id']}.{i['property']}" for i in inputs],
+        "state": with_values(dependency["state"]),
+    }
+
+
+def fetch_roast_ids(transport, callbacks: dict[str, dict]) -> list[int]:
+    """Ask the history page for the ids of all stored roasts."""
+    payload = build_payload(callbacks[REFRESH_CALLBACK], {"refresh-history.n_clicks": 1})
+    _, body = transport.post("/_dash-update-component", payload)
+    options = json.loads(body)["response"]["historical-roasts-checklist"]["options"]
+    return [option["value"] for option in options]
+
+
+class Results:
+    """Thread-safe latency and sample timestamp collection."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.sample_times: set[str] = set()
+
+    def add(self, name: str, latency: float, ok: bool) -> None:
+        with self.lock:
+            self.latencies.setdefault(name, []).append(latency)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def add_sample_times(self, times: list[str]) -> None:
+        with self.lock:
+            self.sample_times.update(times)
+
+
+def timed_post(transport, name: str, payload: dict, results: Results) -> bytes | None:
+    """Post a callback request and record its latency."""
+    start = time.perf_counter()
+    try:
+        status, body = transport.post("/_dash-update-component", payload)
+        ok = status in (200, 204)
+    except Exception:
+        body, ok = None, False
+    results.add(name, time.perf_counter() - start, ok)
+    return body if ok else None
+
+
+def run_ticks(interval: float, deadline: float, action) -> None:
+    """Call action on a fixed schedule, skipping ticks that were missed."""
+    next_tick = time.monotonic()
+    n_intervals = 0
+    while next_tick < deadline:
+        n_intervals += 1
+        action(n_intervals)
+        next_tick += interval
+        now = time.monotonic()
+        while next_tick < now:
+            next_tick += interval
+        time.sleep(max(0.0, next_tick - now))
+
+
+def live_client(transport, dependency, name, interval, deadline, results) -> None:
+    """Simulate one `dcc.Interval` driven callback of a live page client."""
+    def action(n_intervals):
+        payload = build_payload(dependency, {
+            "interval-component.n_intervals": n_intervals,
+            "record-data-switch.on": False,
+        })
+        body = timed_post(transport, name, payload, results)
+        if body and name == "update_graph_live":
+            figure = json.loads(body)["response"]["live-update-graph"]["figure"]
+            if figure["data"]:
+                results.add_sample_times(figure["data"][0]["x"])
+
+    run_ticks(interval, deadline, action)
+
+
+def history_client(transport, dependency, roast_ids, interval, deadline, results, seed) -> None:
+    """Simulate a history page client ticking random roast selections."""
+    rng = random.Random(seed)
+
+    def action(_):
+        selected = rng.sample(roast_ids, k=min(len(roast_ids), rng.randint(1, 5)))
+        payload = build_payload(dependency, {"historical-roasts-checklist.value": selected})
+        timed_post(transport, "update_historical_plot", payload, results)
+
+    run_ticks(interval, deadline, action)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    idx = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def sampler_jitter(sample_times: set[str], interval: float) -> dict:
+    """Summarize the deviation of sample spacing from the nominal interval."""
+    times = sorted(datetime.datetime.fromisoformat(t) for t in sample_times)
+    gaps = [(b - a).total_seconds() for a, b in zip(times, times[1:])]
+    deviations = sorted(abs(gap - interval) * 1000 for gap in gaps)
+    return {
+        "samples": len(times),
+        "missed": sum(1 for gap in gaps if gap > 1.5 * interval),
+        "p50_ms": percentile(deviations, 50),
+        "p99_ms": percentile(deviations, 99),
+        "max_ms": deviations[-1] if deviations else float("nan"),
+    }
+
+
+def print_report(results: Results, elapsed: float, sample_interval: float) -> None:
+    """Print throughput, latency percentiles and sampler jitter."""
+    print(f"\n{'callback':<28}{'count':>7}{'errors':>8}{'req/s':>8}"
+          f"{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    total = 0
+    for name, latencies in sorted(results.latencies.items()):
+        values = sorted(latency * 1000 for latency in latencies)
+        total += len(values)
+        print(f"{name:<28}{len(values):>7}{results.errors.get(name, 0):>8}"
+              f"{len(values) / elapsed:>8.1f}{percentile(values, 50):>9.1f}"
+              f"{percentile(values, 90):>9.1f}{percentile(values, 99):>9.1f}{values[-1]:>9.1f}")
+    print(f"\nTotal throughput: {total / elapsed:.1f} req/s over {elapsed:.1f} s")
+
+    jitter = sampler_jitter(results.sample_times, sample_interval)
+    print(
+        f"Sampler jitter: {jitter['samples']} samples, {jitter['missed']} missed, "
+        f"p50 {jitter['p50_ms']:.1f} ms, p99 {jitter['p99_ms']:.1f} ms, max {jitter['max_ms']:.1f} ms"
+    )
+
+
+def setup_in_process(num_roasts: int, replay: bool, sample_interval: float | None = None):
+    """
+    Point the app at a fresh synthetic database and import it.
+
+    If `sample_interval` is given, the sampler reads at that fixed rate instead
+    of idling, so jitter is measured against it.
+    """
+    db_path = os.path.join(tempfile.mkdtemp(prefix="roast-load-"), "roast_data.db")
+    database_url = f"sqlite:///{db_path}"
+    os.environ["ROAST_DATABASE_URL"] = database_url
+    if sample_interval is not None:
+        # Read by config at import, so set before the app is imported
+        os.environ["ROAST_SAMPLE_FAST_INTERVAL"] = str(sample_interval)
+        os.environ["ROAST_SAMPLE_IDLE_INTERVAL"] = str(sample_interval)
+    if replay:
+        os.environ.setdefault("ROAST_REPLAY", "synthetic")
+
+    seed_database(database_url, num_roasts)
+
+    from app import app
+    return InProcessTransport(app.server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server. Runs in-process if omitted.")
+    parser.add_argument("--clients", type=int, default=4, help="Live page clients.")
+    parser.add_argument("--history-clients", type=int, default=1, help="History page clients.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run.")
+    parser.add_argument("--interval", type=float, default=1.0, help="Live page poll interval.")
+    parser.add_argument("--history-interval", type=float, default=3.0, help="Seconds between selections.")
+    parser.add_argument("--sample-interval", type=float, default=1.0,
+                        help="Fixed sampler interval in-process. Start a remote server with "
+                             "ROAST_SAMPLE_FAST_INTERVAL and ROAST_SAMPLE_IDLE_INTERVAL set to it.")
+    parser.add_argument("--roasts", type=int, default=200, help="Synthetic roasts to seed in-process.")
+    parser.add_argument("--replay", action="store_true",
+                        help="Use the synthetic replay sensor in-process. Jitter is then in simulated time.")
+    args = parser.parse_args()
+
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        transport = setup_in_process(args.roasts, args.replay, args.sample_interval)
+        # Let the sampler fill the plot buffer
+        time.sleep(2 * args.sample_interval)
+
+    callbacks = find_callbacks(transport)
+    roast_ids = fetch_roast_ids(transport, callbacks)
+
+    results = Results()
+    deadline = time.monotonic() + args.duration
+    threads = []
+    for _ in range(args.clients):
+        for key, name in zip(LIVE_CALLBACKS, ["update_graph_live", "check_buffer_and_force_stop"]):
+            threads.append(threading.Thread(
+                target=live_client,
+                args=(transport, callbacks[key], name, args.interval, deadline, results),
+            ))
+    if roast_ids:
+        for i in range(args.history_clients):
+            threads.append(threading.Thread(
+                target=history_client,
+                args=(transport, callbacks[HISTORY_CALLBACK], roast_ids,
+                      args.history_interval, deadline, results, i),
+            ))
+
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print_report(results, time.monotonic() - start, args.sample_interval)
+
+
+if __name__ == "__main__":
+    main()
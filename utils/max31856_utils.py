@@ -0,0 +1,233 @@
+"""
+MAX31856 driver in automatic conversion mode, plus a simulated SPI device.
+
+The chip converts continuously on its own. Reading `temperature` fetches the
+latest finished conversion in one short SPI transaction, instead of starting a
+one-shot conversion and waiting for it like `adafruit_max31856` does. Hardware
+averaging (1-16 samples) and the fault status register are exposed.
+
+Check read throughput against the simulated device:
+    python -m utils.max31856_utils --averaging 4 --seconds 5
+"""
+
+import argparse
+import collections
+import logging
+import math
+import time
+
+# Registers (datasheet table 6); writes set the top address bit
+CR0 = 0x00
+CR1 = 0x01
+MASK = 0x02
+LTCBH = 0x0C
+SR = 0x0F
+WRITE = 0x80
+
+CR0_AUTOCONVERT = 0x80
+CR0_OPEN_CIRCUIT = 0x10  # Open circuit detection, OCFAULT = 01
+CR0_FAULT_CLEAR = 0x02
+CR0_50HZ = 0x01
+
+THERMOCOUPLE_TYPES = {"B": 0, "E": 1, "J": 2, "K": 3, "N": 4, "R": 5, "S": 6, "T": 7}
+AVERAGING_SELECT = {1: 0, 2: 1, 4: 2, 8: 3, 16: 4}
+TEMP_LSB_C = 0.0078125
+
+FAULT_FLAGS = {
+    0x80: "cj_range",
+    0x40: "tc_range",
+    0x20: "cj_high",
+    0x10: "cj_low",
+    0x08: "tc_high",
+    0x04: "tc_low",
+    0x02: "over_under_voltage",
+    0x01: "open_circuit",
+}
+# Faults that make the conversion meaningless; threshold alarms do not
+INVALID_READING_FAULTS = 0x80 | 0x40 | 0x02 | 0x01
+
+
+def conversion_period(averaging: int, mains_hz: int) -> float:
+    """Nominal seconds between finished conversions in automatic mode."""
+    base, extra = (0.1, 1 / 30) if mains_hz == 60 else (0.12, 0.04)
+    return base + (averaging - 1) * extra
+
+
+def decode_temperature(data: bytes) -> float:
+    """Linearized thermocouple temperature (°C) from the three LTCB registers."""
+    raw = int.from_bytes(data[:3], "big") >> 5
+    if raw & 0x40000:
+        raw -= 0x80000
+    return raw * TEMP_LSB_C
+
+
+def encode_temperature(temp: float) -> bytes:
+    """Inverse of decode_temperature, used by the simulated device."""
+    raw = round(temp / TEMP_LSB_C) & 0x7FFFF
+    return (raw << 5).to_bytes(3, "big")
+
+
+def fault_names(status: int) -> list[str]:
+    return [name for bit, name in FAULT_FLAGS.items() if status & bit]
+
+
+class SpiTransport:
+    """Register access over `adafruit_bus_device` (SPI mode 1)."""
+    def __init__(self, spi, cs, baudrate: int = 500_000):
+        from adafruit_bus_device.spi_device import SPIDevice
+
+        self.device = SPIDevice(spi, cs, baudrate=baudrate, polarity=0, phase=1)
+
+    def transfer(self, data: bytes, read_len: int = 0) -> bytes:
+        result = bytearray(read_len)
+        with self.device as spi:
+            spi.write(data)
+            if read_len:
+                spi.readinto(result)
+        return bytes(result)
+
+
+class Max31856:
+    """
+    MAX31856 configured for continuous conversion.
+
+    Args:
+        transport: Object with `transfer(data, read_len)`, e.g. SpiTransport
+            or FakeMax31856Spi.
+        averaging (int): Hardware averaging, 1, 2, 4, 8 or 16 samples.
+        mains_hz (int): 50 or 60, selects the noise rejection filter.
+        tc_type (str): Thermocouple type letter.
+    """
+    def __init__(self, transport, averaging: int = 1, mains_hz: int = 60, tc_type: str = "K"):
+        if averaging not in AVERAGING_SELECT:
+            raise ValueError(f"Averaging must be one of {list(AVERAGING_SELECT)}, got {averaging}")
+        self.transport = transport
+        self.conversion_sec = conversion_period(averaging, mains_hz)
+        self.faults = []
+
+        cr0 = CR0_AUTOCONVERT | CR0_OPEN_CIRCUIT | (CR0_50HZ if mains_hz == 50 else 0)
+        cr1 = AVERAGING_SELECT[averaging] << 4 | THERMOCOUPLE_TYPES[tc_type]
+        # Stop converting while reconfiguring, then start automatic mode
+        self.write_register(CR0, 0)
+        self.write_register(CR1, cr1)
+        self.write_register(CR0, cr0 | CR0_FAULT_CLEAR)
+        self.ready_at = time.monotonic() + self.conversion_sec
+
+    def write_register(self, address: int, value: int) -> None:
+        self.transport.transfer(bytes([address | WRITE, value]))
+
+    def read_registers(self, address: int, length: int) -> bytes:
+        return self.transport.transfer(bytes([address]), length)
+
+    @property
+    def temperature(self) -> float:
+        """
+        Latest conversion in celsius, without waiting.
+
+        NaN before the first conversion has finished or while a fault makes
+        the reading invalid; `faults` lists the active fault flags.
+        """
+        if time.monotonic() < self.ready_at:
+            return math.nan
+
+        # LTCBH, LTCBM, LTCBL and SR in one burst read
+        data = self.read_registers(LTCBH, 4)
+        status = data[3]
+        faults = fault_names(status)
+        if faults != self.faults:
+            if faults:
+                logging.warning("Thermocouple fault: %s", ", ".join(faults))
+            else:
+                logging.info("Thermocouple faults cleared.")
+            self.faults = faults
+
+        if status & INVALID_READING_FAULTS:
+            return math.nan
+        return decode_temperature(data)
+
+
+class FakeMax31856Spi:
+    """
+    Simulated MAX31856 register file for running the driver without hardware.
+
+    Conversions finish every `conversion_period` of the configured averaging
+    and filter, each one sampling `temperature` (°C, or a callable of seconds
+    since automatic mode started). Set `status` to inject fault flags.
+    """
+    def __init__(self, temperature=25.0, clock=time.monotonic):
+        self.registers = bytearray(16)
+        self.registers[CR1] = THERMOCOUPLE_TYPES["K"]
+        self.temperature = temperature
+        self.clock = clock
+        self.status = 0
+        self.started = None
+        self.conversions = 0
+        self.transactions = 0
+        self.history = collections.deque()
+
+    def transfer(self, data: bytes, read_len: int = 0) -> bytes:
+        self.transactions += 1
+        address = data[0] & ~WRITE
+        if data[0] & WRITE:
+            self.registers[address:address + len(data) - 1] = data[1:]
+            if address == CR0:
+                self.configure()
+            return b""
+
+        self.convert()
+        return bytes(self.registers[address:address + read_len])
+
+    def configure(self) -> None:
+        cr0 = self.registers[CR0]
+        self.registers[CR0] &= ~CR0_FAULT_CLEAR
+        self.started = self.clock() if cr0 & CR0_AUTOCONVERT else None
+        self.conversions = 0
+        averaging = 1 << min(self.registers[CR1] >> 4 & 0x07, 4)
+        self.history = collections.deque(maxlen=averaging)
+        self.period = conversion_period(averaging, 50 if cr0 & CR0_50HZ else 60)
+
+    def convert(self) -> None:
+        """Run the conversions that have finished since the last access."""
+        self.registers[SR] = self.status
+        if self.started is None:
+            return
+        finished = int((self.clock() - self.started) / self.period)
+        # Only the last few matter for the running average
+        start = max(self.conversions, finished - self.history.maxlen)
+        for n in range(start, finished):
+            elapsed = (n + 1) * self.period
+            temp = self.temperature(elapsed) if callable(self.temperature) else self.temperature
+            self.history.append(temp)
+        if finished > self.conversions:
+            self.registers[LTCBH:LTCBH + 3] = encode_temperature(sum(self.history) / len(self.history))
+            self.conversions = finished
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the driver against the simulated MAX31856.")
+    parser.add_argument("--averaging", type=int, default=1)
+    parser.add_argument("--mains-hz", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--interval", type=float, default=0.0, help="Sleep between reads.")
+    args = parser.parse_args()
+
+    device = FakeMax31856Spi(temperature=lambda sec: 20.0 + 0.5 * sec)
+    sensor = Max31856(device, args.averaging, args.mains_hz)
+    reads, worst = 0, 0.0
+    end = time.monotonic() + args.seconds
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        sensor.temperature
+        worst = max(worst, time.perf_counter() - start)
+        reads += 1
+        if args.interval:
+            time.sleep(args.interval)
+
+    print(f"Conversion period   {sensor.conversion_sec * 1000:.1f} ms")
+    print(f"Reads               {reads / args.seconds:.0f} /s")
+    print(f"Fresh conversions   {device.conversions / args.seconds:.1f} /s")
+    print(f"Worst read          {worst * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
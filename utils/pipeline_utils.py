@@ -0,0 +1,376 @@
+"""
+Composable processing for sensor samples: source -> stages -> sinks.
+
+Stages transform a sample or drop it by returning None. Sinks consume every
+sample that makes it through. Each stage and sink does O(1) work per sample.
+
+Benchmark every stage and sink:
+    python -m utils.pipeline_utils
+"""
+
+import bisect
+import collections
+import datetime
+import logging
+import math
+import os
+import threading
+import time
+
+from utils.reference_utils import RateOfRise
+from utils.temp_utils import c_to_f, record_data
+
+
+class Sample:
+    """
+    A single sensor reading moving through the pipeline.
+
+    `read_at` is the wall clock time (time.time()) the sensor was read, used
+    for latency tracing.
+    """
+    __slots__ = ("reading_time", "temp", "channels", "read_at")
+
+    def __init__(self, reading_time: datetime.datetime, temp: float, read_at: float | None = None):
+        self.reading_time = reading_time
+        self.temp = temp
+        self.channels = {}
+        self.read_at = read_at
+
+
+class UnitConversion:
+    """Convert celsius readings to fahrenheit."""
+    def __init__(self, fahrenheit: bool = True):
+        self.fahrenheit = fahrenheit
+
+    def process(self, sample: Sample) -> Sample:
+        if self.fahrenheit:
+            sample.temp = c_to_f(sample.temp)
+        return sample
+
+
+class FaultRejection:
+    """Drop readings that are not finite or are outside the sensor's plausible range (°F)."""
+    def __init__(self, min_temp: float = -40.0, max_temp: float = 1800.0):
+        self.min_temp = min_temp
+        self.max_temp = max_temp
+
+    def process(self, sample: Sample) -> Sample | None:
+        if not math.isfinite(sample.temp) or not self.min_temp <= sample.temp <= self.max_temp:
+            return None
+        return sample
+
+
+class SpikeRejection:
+    """
+    Drop single readings that jump too far from the last accepted one.
+
+    A jump that persists for `max_rejected` readings is accepted as a real change.
+    """
+    def __init__(self, max_jump: float, max_rejected: int = 3):
+        self.max_jump = max_jump
+        self.max_rejected = max_rejected
+        self.last_temp = None
+        self.rejected = 0
+
+    def process(self, sample: Sample) -> Sample | None:
+        if (
+            self.last_temp is not None
+            and abs(sample.temp - self.last_temp) > self.max_jump
+            and self.rejected < self.max_rejected
+        ):
+            self.rejected += 1
+            return None
+        self.rejected = 0
+        self.last_temp = sample.temp
+        return sample
+
+
+class MedianFilter:
+    """Running median over the last `window` readings."""
+    def __init__(self, window: int = 3):
+        self.window = window
+        self.history = collections.deque()
+        self.ordered = []
+
+    def process(self, sample: Sample) -> Sample:
+        self.history.append(sample.temp)
+        bisect.insort(self.ordered, sample.temp)
+        if len(self.history) > self.window:
+            del self.ordered[bisect.bisect_left(self.ordered, self.history.popleft())]
+        sample.temp = self.ordered[len(self.ordered) // 2]
+        return sample
+
+
+class EmaFilter:
+    """Exponential moving average smoothing."""
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.value = None
+
+    def process(self, sample: Sample) -> Sample:
+        if self.value is None:
+            self.value = sample.temp
+        else:
+            self.value += self.alpha * (sample.temp - self.value)
+        sample.temp = self.value
+        return sample
+
+
+class RateOfRiseChannel:
+    """Add a "ror" channel (degrees per minute) over a sliding window."""
+    def __init__(self, window_sec: float = 30.0):
+        self.ror = RateOfRise(window_sec)
+        self.start = None
+
+    def process(self, sample: Sample) -> Sample:
+        if self.start is None:
+            self.start = sample.reading_time
+        sec = (sample.reading_time - self.start).total_seconds()
+        sample.channels["ror"] = self.ror.update(sec, sample.temp)
+        return sample
+
+
+class PlotBufferSink:
+    """
+    Append samples to the live view deques.
+
+    With `trace_plot`, (read_at, buffered_at) wall clock stamps are appended too.
+    """
+    def __init__(
+        self,
+        data_lock: threading.Lock,
+        temp_plot: collections.deque,
+        time_plot: collections.deque,
+        trace_plot: collections.deque | None = None,
+    ):
+        self.data_lock = data_lock
+        self.temp_plot = temp_plot
+        self.time_plot = time_plot
+        self.trace_plot = trace_plot
+
+    def write(self, sample: Sample) -> None:
+        with self.data_lock:
+            self.temp_plot.append(sample.temp)
+            self.time_plot.append(sample.reading_time)
+            if self.trace_plot is not None:
+                self.trace_plot.append((sample.read_at, time.time()))
+
+
+class RecordingSink:
+    """
+    Append samples to the recording deques while recording.
+
+    Listeners are called with (temp, reading_time, channels) for each recorded
+    sample, inside the data lock, so they share the stages' derived channels.
+    """
+    def __init__(
+        self,
+        data_lock: threading.Lock,
+        recording: threading.Event,
+        temp_recorded: collections.deque,
+        time_recorded: collections.deque,
+        force_stop_recording: threading.Event,
+        listeners: list | None = None,
+    ):
+        self.data_lock = data_lock
+        self.recording = recording
+        self.temp_recorded = temp_recorded
+        self.time_recorded = time_recorded
+        self.force_stop_recording = force_stop_recording
+        self.listeners = listeners or []
+
+    def write(self, sample: Sample) -> None:
+        if not self.recording.is_set():
+            return
+        with self.data_lock:
+            record_data(
+                sample.temp, sample.reading_time, self.temp_recorded, self.time_recorded,
+                self.force_stop_recording,
+            )
+            for listener in self.listeners:
+                listener(sample.temp, sample.reading_time, sample.channels)
+
+
+class JournalSink:
+    """
+    Append recorded samples to a CSV journal so a crash mid-roast loses at most
+    `flush_every` samples. The journal is truncated when recording starts and
+    discarded once the roast is saved, so a journal found at startup holds an
+    unsaved roast; read it back with `read_journal`.
+    """
+    def __init__(self, path: str, recording: threading.Event, flush_every: int = 10):
+        self.path = path
+        self.recording = recording
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.file = None
+        self.pending = 0
+
+    def write(self, sample: Sample) -> None:
+        with self.lock:
+            if not self.recording.is_set():
+                self.close()
+                return
+
+            if self.file is None:
+                self.file = open(self.path, "w")
+            self.file.write(f"{sample.reading_time.isoformat()},{sample.temp:.2f}\n")
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self.file.flush()
+                self.pending = 0
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.pending = 0
+
+    def discard(self) -> None:
+        """Delete the journal after its roast was saved."""
+        with self.lock:
+            self.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def read_journal(path: str) -> tuple[list[datetime.datetime], list[float]]:
+    """Samples from a recording journal. A line cut off by a crash is skipped."""
+    times, temps = [], []
+    if not os.path.exists(path):
+        return times, temps
+    with open(path) as f:
+        for line in f:
+            try:
+                reading_time, temp = line.rstrip("\n").split(",")
+                times.append(datetime.datetime.fromisoformat(reading_time))
+                temps.append(float(temp))
+            except ValueError:
+                logging.warning("Skipping malformed journal line: %r", line)
+    return times, temps
+
+
+class MetricsSink:
+    """Count samples and track the sample rate."""
+    def __init__(self):
+        self.count = 0
+        self.last_time = None
+        self.interval_ema = None
+
+    def write(self, sample: Sample) -> None:
+        self.count += 1
+        if self.last_time is not None:
+            interval = (sample.reading_time - self.last_time).total_seconds()
+            if self.interval_ema is None:
+                self.interval_ema = interval
+            else:
+                self.interval_ema += 0.1 * (interval - self.interval_ema)
+        self.last_time = sample.reading_time
+
+
+class AdaptiveSampling:
+    """
+    Pick the sampler interval from recording state and temperature dynamics.
+
+    Sampling is fast while recording, or while |RoR| is at least
+    `ror_threshold` (°F/min) and for `hold_sec` after, and slow otherwise.
+    Reads the "ror" channel, so RateOfRiseChannel must be a stage.
+    """
+    def __init__(
+        self,
+        recording: threading.Event,
+        fast_interval: float = 0.5,
+        idle_interval: float = 5.0,
+        ror_threshold: float = 15.0,
+        hold_sec: float = 60.0,
+    ):
+        self.recording = recording
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.ror_threshold = ror_threshold
+        self.hold_sec = hold_sec
+        self.last_active = None
+        self.interval = idle_interval
+        # Set to end the sampler's current idle wait, e.g. when recording starts
+        self.wake = threading.Event()
+
+    def write(self, sample: Sample) -> None:
+        ror = sample.channels.get("ror")
+        if self.recording.is_set() or (ror is not None and abs(ror) >= self.ror_threshold):
+            self.last_active = sample.reading_time
+
+        active = (
+            self.last_active is not None
+            and (sample.reading_time - self.last_active).total_seconds() < self.hold_sec
+        )
+        self.interval = self.fast_interval if active else self.idle_interval
+
+    def next_interval(self) -> float:
+        """Seconds until the next reading. Switches to fast as soon as recording starts."""
+        if self.recording.is_set():
+            return self.fast_interval
+        return self.interval
+
+
+class Pipeline:
+    """Run a sample through stages, then hand it to every sink."""
+    def __init__(self, stages: list, sinks: list):
+        self.stages = stages
+        self.sinks = sinks
+        self.dropped = collections.Counter()
+
+    def push(self, reading_time: datetime.datetime, temp: float, read_at: float | None = None) -> Sample | None:
+        """Process a raw sensor reading."""
+        return self.process(Sample(reading_time, temp, read_at))
+
+    def process(self, sample: Sample) -> Sample | None:
+        for stage in self.stages:
+            sample = stage.process(sample)
+            if sample is None:
+                name = type(stage).__name__
+                self.dropped[name] += 1
+                logging.debug("Sample dropped by %s", name)
+                return None
+
+        for sink in self.sinks:
+            sink.write(sample)
+        return sample
+
+
+def benchmark(component, num_samples: int = 100_000) -> float:
+    """Mean nanoseconds per sample for a stage or sink."""
+    start_time = datetime.datetime(2025, 1, 1)
+    samples = [
+        Sample(start_time + datetime.timedelta(seconds=i), 200 + (i % 50) * 0.5)
+        for i in range(num_samples)
+    ]
+    run = component.process if hasattr(component, "process") else component.write
+
+    start = time.perf_counter()
+    for sample in samples:
+        run(sample)
+    return (time.perf_counter() - start) / num_samples * 1e9
+
+
+def main():
+    lock = threading.Lock()
+    recording = threading.Event()
+    recording.set()
+    components = [
+        UnitConversion(),
+        FaultRejection(),
+        SpikeRejection(max_jump=20.0),
+        MedianFilter(5),
+        EmaFilter(),
+        RateOfRiseChannel(),
+        PlotBufferSink(lock, collections.deque(maxlen=120), collections.deque(maxlen=120)),
+        RecordingSink(lock, recording, collections.deque(), collections.deque(), threading.Event()),
+        MetricsSink(),
+        AdaptiveSampling(recording),
+    ]
+    for component in components:
+        print(f"{type(component).__name__:<20}{benchmark(component):>10.0f} ns/sample")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,45 @@
-import json
-
 import plotly.graph_objs as go
 
+from config import WEBGL_POINT_THRESHOLD
 from models import Roast
+from utils.archive_utils import load_curves
+from utils.event_utils import event_label, load_events
 from utils.temp_utils import ROAST_STAGES, ROAST_TEMPS, f_to_c
 
 FAHRENHEIT_DISPLAY = True
 
-def create_temperature_plot(roasts_data: list[dict], realtime: bool = True):
+def create_temperature_plot(
+    roasts_data: list[dict], realtime: bool = True, reference: dict | None = None
+):
     """
     Creates a Plotly figure for historical roast data.
     Args:
         roasts_data: A list of Roasts or dicts, each containing:
-            {"start_time", "bean_info", "time_data", "temp_data", "event_markers"}
+            {"start_time", "bean_info", "time_data", "temp_data", "events"}
             "time_data" can be datetime objects or float
+        realtime: Format the plot for the live page.
+        reference: Optional {"time_data", "temp_data"} drawn as a ghost curve.
+
+    Above WEBGL_POINT_THRESHOLD total points, roasts are drawn as WebGL lines
+    instead of SVG markers.
     """
 
     num_roasts = len(roasts_data)
     colors = [f"hsl({h * 20}, 70%, 50%)" for h in range(1, num_roasts+1)]
+    webgl = sum(len(roast["temp_data"]) for roast in roasts_data) > WEBGL_POINT_THRESHOLD
 
     fig = go.Figure()
     all_temp_values = []
     for i, roast in enumerate(roasts_data):
         all_temp_values.extend(roast["temp_data"])
 
-        add_line_plot(roast, colors[i], fig)
+        add_line_plot(roast, colors[i], fig, webgl)
+
+    add_event_markers(roasts_data, colors, fig)
 
-        add_event_markers(roast, fig, colors[i])
+    if reference:
+        all_temp_values.extend(reference["temp_data"])
+        add_reference_plot(reference, fig)
 
     add_roast_level_lines(fig)
 
@@ -36,9 +49,66 @@ def create_temperature_plot(roasts_data: list[dict], realtime: bool = True):
     return fig
 
 
-def add_line_plot(roast, color, fig):
+def create_aggregate_plot(aggregate: dict, align_first_crack: bool = False):
+    """
+    Creates a Plotly figure of percentile bands, median and mean across roasts.
+    Args:
+        aggregate: Output of `aggregate_utils.aggregate_roasts`.
+        align_first_crack: Whether time is relative to first crack.
+    """
+    fig = go.Figure()
+    x = aggregate["time_data"]
+    percentiles = aggregate["percentiles"]
+    low, *inner, high = sorted(percentiles)
+
+    bands = [(low, high, "rgba(70, 130, 180, 0.15)")]
+    if inner:
+        bands.append((inner[0], inner[-1], "rgba(70, 130, 180, 0.3)"))
+
+    for lower, upper, fill in bands:
+        fig.add_trace(go.Scatter(
+            x=x, y=percentiles[lower], mode="lines", line={"width": 0},
+            showlegend=False, hoverinfo="skip",
+        ))
+        fig.add_trace(go.Scatter(
+            x=x, y=percentiles[upper], mode="lines", line={"width": 0},
+            fill="tonexty", fillcolor=fill, name=f"p{lower}-p{upper}",
+        ))
+
+    fig.add_trace(go.Scatter(
+        x=x, y=aggregate["median"], mode="lines", name="Median",
+        line={"color": "steelblue", "width": 2},
+    ))
+    fig.add_trace(go.Scatter(
+        x=x, y=aggregate["mean"], mode="lines", name="Mean",
+        line={"color": "black", "width": 1, "dash": "dash"},
+    ))
+
+    add_roast_level_lines(fig)
+
+    y_range = calculate_y_range([float(min(percentiles[low])), float(max(percentiles[high]))])
+    args = layout_args(y_range, realtime=False)
+    if align_first_crack:
+        args["xaxis_title"] = "Time from first crack [min]"
+    fig.update_layout(args)
+
+    return fig
+
+
+def add_line_plot(roast, color, fig, webgl: bool = False):
     """Add main temperature trace for this roast."""
     legend_name = f"{roast["start_time"].strftime('%Y-%m-%d %H:%M')}"
+    if webgl:
+        fig.add_trace(go.Scattergl(
+            x=roast["time_data"],
+            y=roast["temp_data"],
+            mode="lines",
+            name=legend_name,
+            line={"color": color, "width": 2},
+            showlegend=True,
+        ))
+        return
+
     fig.add_trace(go.Scatter(
         x=roast["time_data"],
         y=roast["temp_data"],
@@ -49,38 +119,47 @@ def add_line_plot(roast, color, fig):
     ))
 
 
-def add_event_markers(roast: dict, fig, color):
-    """Add event markers for this roast (1st crack, 2nd crack)"""
-    for event_name in ["first_crack_start", "second_crack_start"]:
-        event_time = roast[f"{event_name}_time"]
-        event_temp = roast[f"{event_name}_temp"]
-        if event_time is None or event_temp is None:
-            continue
+def add_reference_plot(reference: dict, fig):
+    """Add the reference profile as a ghost curve."""
+    fig.add_trace(go.Scatter(
+        x=reference["time_data"],
+        y=reference["temp_data"],
+        mode="lines",
+        name="Reference",
+        line={"color": "gray", "width": 2, "dash": "dot"},
+        opacity=0.6,
+        showlegend=False,
+    ))
 
-        fig.add_trace(go.Scatter(
-            x=[event_time],
-            y=[event_temp],
-            mode="markers",
-            marker={
-                "symbol": "star",
-                "size": 10,
-                "color": color,
-                "line": {"width": 1, "color": "white"}
-            },
-            showlegend=False
-        ))
-        fig.add_annotation(
-            x=event_time,
-            y=event_temp,
-            text=f"{event_name}",
-            showarrow=True,
-            arrowhead=1,
-            ax=0,
-            ay=-30,
-            font={"color": color, "size": 9},
-            bgcolor="rgba(255, 255, 255, 0.7)",
-            opacity=0.8
-        )
+
+def add_event_markers(roasts_data: list[dict], colors: list[str], fig):
+    """Add every roast's events as a single labelled marker trace."""
+    x, y, text, point_colors = [], [], [], []
+    for roast, color in zip(roasts_data, colors):
+        for event in roast.get("events") or []:
+            x.append(event["time"])
+            y.append(event["temp"])
+            text.append(event_label(event))
+            point_colors.append(color)
+    if not x:
+        return
+
+    fig.add_trace(go.Scatter(
+        x=x,
+        y=y,
+        text=text,
+        mode="markers+text",
+        textposition="top center",
+        textfont={"color": point_colors, "size": 9},
+        marker={
+            "symbol": "star",
+            "size": 10,
+            "color": point_colors,
+            "line": {"width": 1, "color": "white"}
+        },
+        hoverinfo="text",
+        showlegend=False
+    ))
 
 
 def calculate_y_range(all_temp_values: list[float], padding: int = 5) -> list:
@@ -141,14 +220,15 @@ def layout_args(y_range: list, realtime: bool = True) -> dict:
 
 def convert_all_roasts_to_dicts(roasts_data: list[Roast]) -> list[dict]:
     """Convert a list of Roasts to a list of dicts."""
+    events = load_events(roasts_data)
     roast_dicts = []
     for roast in roasts_data:
-        roast_dicts.append(convert_object_to_dict(roast))
+        roast_dicts.append(convert_object_to_dict(roast, events[roast.id]))
     return roast_dicts
 
 
-def convert_object_to_dict(roast: Roast) -> dict:
-    """Convert Roast object from database to dict."""
+def convert_object_to_dict(roast: Roast, events: list[dict] | None = None) -> dict:
+    """Convert Roast object from database to dict. Events are loaded if not given."""
     keys = [
         "id",
         "start_time",
@@ -157,6 +237,8 @@ def convert_object_to_dict(roast: Roast) -> dict:
         "first_crack_start_temp",
         "second_crack_start_time",
         "second_crack_start_temp",
+        "detected_first_crack_time",
+        "detected_first_crack_temp",
         "tasting_comments",
     ]
 
@@ -164,12 +246,15 @@ def convert_object_to_dict(roast: Roast) -> dict:
     for key in keys:
         result[key] = getattr(roast, key)
 
-    sec_data = json.loads(roast.sec_from_start)
+    sec_data, result["temp_data"] = load_curves(roast)
     result["time_data"] = [sec/60 for sec in sec_data]
-    result["temp_data"] = json.loads(roast.temperature_f)
+
+    if events is None:
+        events = load_events([roast])[roast.id]
+    result["events"] = [{**event, "time": event["time"] / 60} for event in events]
 
     # convert seconds to minutes
-    for key in ["first_crack_start_time", "second_crack_start_time"]:
+    for key in ["first_crack_start_time", "second_crack_start_time", "detected_first_crack_time"]:
         if result[key]:
             result[key] /= 60
 
@@ -0,0 +1,170 @@
+"""Opt-in profiling for Dash callbacks.
+
+Enable with ROAST_PROFILE_CALLBACKS=1. When disabled, `profile_callback` returns
+the callback unchanged so there is no per-call overhead.
+"""
+
+import cProfile
+import datetime
+import functools
+import logging
+import os
+import pstats
+import threading
+import time
+
+from flask import jsonify, request
+
+from config import PROFILE_CALLBACKS, PROFILE_DIR
+
+_stats_lock = threading.Lock()
+callback_stats: dict[str, dict] = {}
+_session_lock = threading.Lock()
+_session = None
+
+
+class ProfileSession:
+    """A bounded cProfile capture across all profiled callbacks."""
+
+    def __init__(self, max_calls: int = 50, max_seconds: float = 60.0, out_dir: str = PROFILE_DIR):
+        self.max_calls = max_calls
+        self.deadline = time.monotonic() + max_seconds
+        self.out_dir = out_dir
+        self.calls = 0
+        self.profiler = cProfile.Profile()
+        # cProfile can only have one active profiler per interpreter, so calls
+        # made while a session is running are serialized.
+        self.lock = threading.Lock()
+        self.finished = False
+        # Ends the session on time even if no profiled call arrives after the deadline
+        self.timer = threading.Timer(max_seconds, self.expire)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def run(self, func, *args, **kwargs):
+        """Run func under the session profiler."""
+        with self.lock:
+            if self.finished:
+                return func(*args, **kwargs)
+            try:
+                return self.profiler.runcall(func, *args, **kwargs)
+            finally:
+                self.calls += 1
+                if self.calls >= self.max_calls or time.monotonic() >= self.deadline:
+                    self.finish()
+
+    def expire(self) -> None:
+        """Finish the session once its deadline has passed."""
+        with self.lock:
+            if time.monotonic() >= self.deadline:
+                self.finish()
+
+    def finish(self) -> str | None:
+        """Dump profiler results to disk. Must be called with the lock held."""
+        if self.finished:
+            return None
+        self.finished = True
+        self.timer.cancel()
+
+        if not self.calls:
+            logging.info("Profiling session ended with no calls captured.")
+            return None
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.out_dir, f"callbacks-{stamp}.prof")
+        self.profiler.dump_stats(path)
+        with open(path.replace(".prof", ".txt"), "w") as f:
+            stats = pstats.Stats(self.profiler, stream=f)
+            stats.sort_stats("cumulative").print_stats(40)
+        logging.info("Profiling session wrote %s calls to %s", self.calls, path)
+        return path
+
+
+def start_session(max_calls: int = 50, max_seconds: float = 60.0) -> bool:
+    """Start a profiling session. Returns False if one is already running."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.expire()
+            if not _session.finished:
+                return False
+        _session = ProfileSession(max_calls, max_seconds)
+    logging.info(
+        "Profiling session started (max %s calls, %s seconds).", max_calls, max_seconds
+    )
+    return True
+
+
+def record_call(name: str, wall: float, cpu: float) -> None:
+    """Accumulate per-callback timing."""
+    with _stats_lock:
+        stats = callback_stats.setdefault(
+            name, {"calls": 0, "wall_total": 0.0, "cpu_total": 0.0, "wall_max": 0.0}
+        )
+        stats["calls"] += 1
+        stats["wall_total"] += wall
+        stats["cpu_total"] += cpu
+        stats["wall_max"] = max(stats["wall_max"], wall)
+    logging.debug("%s took %.1f ms wall, %.1f ms cpu", name, wall * 1000, cpu * 1000)
+
+
+def profile_callback(func):
+    """Record wall/CPU time for every call of a Dash callback.
+
+    Apply below the `@callback(...)` decorator so Dash registers the wrapper.
+    """
+    if not PROFILE_CALLBACKS:
+        return func
+
+    name = f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _session
+        if session is not None and session.finished:
+            session = None
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            if session is not None:
+                return session.run(func, *args, **kwargs)
+            return func(*args, **kwargs)
+        finally:
+            record_call(
+                name, time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            )
+
+    return wrapper
+
+
+def summarize_stats() -> dict[str, dict]:
+    """Return per-callback timing with means in milliseconds."""
+    with _stats_lock:
+        summary = {}
+        for name, stats in callback_stats.items():
+            calls = stats["calls"]
+            summary[name] = {
+                "calls": calls,
+                "wall_mean_ms": stats["wall_total"] / calls * 1000,
+                "cpu_mean_ms": stats["cpu_total"] / calls * 1000,
+                "wall_max_ms": stats["wall_max"] * 1000,
+            }
+    return summary
+
+
+def register_profiling_routes(server) -> None:
+    """Add /profiling endpoints to the Flask server, if profiling is enabled."""
+    if not PROFILE_CALLBACKS:
+        return
+
+    @server.route("/profiling/stats")
+    def profiling_stats():
+        return jsonify(summarize_stats())
+
+    @server.route("/profiling/start", methods=["POST"])
+    def profiling_start():
+        max_calls = request.args.get("calls", default=50, type=int)
+        max_seconds = request.args.get("seconds", default=60.0, type=float)
+        started = start_session(max_calls, max_seconds)
+        return jsonify({"started": started}), (200 if started else 409)
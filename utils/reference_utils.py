@@ -0,0 +1,151 @@
+"""Follow a stored roast as a reference profile during a live roast."""
+
+import collections
+import datetime
+import threading
+
+REFERENCE_GRID_SEC = 0.5
+ROR_WINDOW_SEC = 30.0
+GHOST_LOOKAHEAD_SEC = 30.0
+
+
+class RateOfRise:
+    """Incremental rate of rise (°/min) over a sliding time window."""
+    def __init__(self, window_sec: float = ROR_WINDOW_SEC):
+        self.window_sec = window_sec
+        self.samples = collections.deque()
+
+    def update(self, sec: float, temp: float) -> float | None:
+        """Add a sample and return the current rate of rise, amortized O(1)."""
+        self.samples.append((sec, temp))
+        while len(self.samples) > 2 and sec - self.samples[1][0] >= self.window_sec:
+            self.samples.popleft()
+
+        oldest_sec, oldest_temp = self.samples[0]
+        if sec <= oldest_sec:
+            return None
+        return (temp - oldest_temp) / (sec - oldest_sec) * 60
+
+
+class ReferenceProfile:
+    """A reference curve pre-interpolated onto a fixed time grid."""
+    def __init__(
+        self,
+        sec_data: list[float],
+        temp_data: list[float],
+        step: float = REFERENCE_GRID_SEC,
+        ror_window_sec: float = ROR_WINDOW_SEC,
+    ):
+        if not sec_data or len(sec_data) != len(temp_data):
+            raise ValueError("Reference curve needs matching, non-empty time and temperature data.")
+        self.step = step
+        self.temps = interpolate_onto_grid(sec_data, temp_data, step)
+
+        lag = max(1, round(ror_window_sec / step))
+        self.rors = [
+            (self.temps[i] - self.temps[max(0, i - lag)]) / (min(i, lag) * step) * 60 if i else 0.0
+            for i in range(len(self.temps))
+        ]
+
+    @property
+    def duration(self) -> float:
+        return (len(self.temps) - 1) * self.step
+
+    def index(self, sec: float) -> int | None:
+        """Grid index nearest to sec, or None outside the reference."""
+        idx = round(sec / self.step)
+        if idx < 0 or idx >= len(self.temps):
+            return None
+        return idx
+
+    def deviation(self, sec: float, temp: float, ror: float | None) -> tuple[float, float | None] | None:
+        """Return (ΔT, ΔRoR) of a live sample against the reference in O(1)."""
+        idx = self.index(sec)
+        if idx is None:
+            return None
+        delta_ror = ror - self.rors[idx] if ror is not None else None
+        return temp - self.temps[idx], delta_ror
+
+    def curve(self, start_sec: float, end_sec: float) -> tuple[list[float], list[float]]:
+        """Slice of the reference between two times, as (seconds, temperatures)."""
+        first = max(0, int(start_sec / self.step))
+        last = min(len(self.temps) - 1, int(end_sec / self.step))
+        secs = [i * self.step for i in range(first, last + 1)]
+        return secs, self.temps[first:last + 1]
+
+
+def interpolate_onto_grid(sec_data: list[float], temp_data: list[float], step: float) -> list[float]:
+    """Linearly interpolate a curve onto a grid starting at its first time."""
+    t0 = sec_data[0]
+    num_points = int((sec_data[-1] - t0) / step) + 1
+    grid = []
+    j = 0
+    for i in range(num_points):
+        t = t0 + i * step
+        while j < len(sec_data) - 2 and sec_data[j + 1] < t:
+            j += 1
+        if j + 1 >= len(sec_data) or sec_data[j + 1] == sec_data[j]:
+            grid.append(temp_data[j])
+            continue
+        frac = (t - sec_data[j]) / (sec_data[j + 1] - sec_data[j])
+        grid.append(temp_data[j] + (temp_data[j + 1] - temp_data[j]) * min(max(frac, 0.0), 1.0))
+    return grid
+
+
+class ReferenceTracker:
+    """
+    Track the deviation of a live roast from a reference, one sample at a time.
+
+    `update` is called by the sampler for each recorded sample with the
+    pipeline's channels (RoR comes from RateOfRiseChannel), `reset` when a new
+    recording starts.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profile: ReferenceProfile | None = None
+        self.start: datetime.datetime | None = None
+        self.latest: tuple[float, float | None] | None = None
+
+    def set_profile(self, profile: ReferenceProfile | None) -> None:
+        with self.lock:
+            self.profile = profile
+            self.latest = None
+
+    def reset(self) -> None:
+        with self.lock:
+            self.start = None
+            self.latest = None
+
+    def update(self, temp: float, reading_time: datetime.datetime, channels: dict) -> None:
+        with self.lock:
+            if self.start is None:
+                self.start = reading_time
+            sec = (reading_time - self.start).total_seconds()
+            if self.profile is not None:
+                self.latest = self.profile.deviation(sec, temp, channels.get("ror"))
+
+    def ghost(self, window_start: datetime.datetime, window_end: datetime.datetime) -> dict | None:
+        """Reference curve within the plotted window, in wall-clock time."""
+        with self.lock:
+            if self.profile is None or self.start is None:
+                return None
+            start_sec = (window_start - self.start).total_seconds()
+            end_sec = (window_end - self.start).total_seconds() + GHOST_LOOKAHEAD_SEC
+            secs, temps = self.profile.curve(start_sec, end_sec)
+            return {
+                "time_data": [self.start + datetime.timedelta(seconds=s) for s in secs],
+                "temp_data": temps,
+            }
+
+    def readout(self) -> str:
+        """Delta readout for the live page."""
+        with self.lock:
+            if self.profile is None:
+                return ""
+            if self.latest is None:
+                return "Reference ready"
+            delta_temp, delta_ror = self.latest
+        text = f"ΔT {delta_temp:+.1f} °F"
+        if delta_ror is not None:
+            text += f"  ΔRoR {delta_ror:+.1f} °F/min"
+        return text
@@ -0,0 +1,134 @@
+"""Replay stored or synthetic roast curves through the temperature sampler."""
+
+import bisect
+import datetime
+import math
+import random
+import threading
+import time
+
+from models import Roast, get_db
+from utils.archive_utils import load_curves
+from utils.temp_utils import f_to_c
+
+
+class SimulatedClock:
+    """
+    Clock for deterministic replays.
+
+    Simulated time advances by exactly the requested amount on every `sleep`,
+    while the real sleep is shortened by `speedup`. A sleep cut short by `wake`
+    advances by the scaled real time that passed instead.
+    """
+    def __init__(self, speedup: float = 60.0, start: datetime.datetime | None = None):
+        self.speedup = speedup
+        self.start = start or datetime.datetime.now()
+        self.elapsed = 0.0
+
+    def now(self) -> datetime.datetime:
+        return self.start + datetime.timedelta(seconds=self.elapsed)
+
+    def sleep(self, seconds: float, wake: threading.Event | None = None) -> None:
+        if self.speedup and math.isfinite(self.speedup):
+            if wake is None:
+                time.sleep(seconds / self.speedup)
+            else:
+                start = time.monotonic()
+                if wake.wait(seconds / self.speedup):
+                    seconds = min(seconds, (time.monotonic() - start) * self.speedup)
+        self.elapsed += seconds
+
+
+class ReplayThermocouple:
+    """Thermocouple that reports a stored curve at the clock's elapsed time."""
+    def __init__(
+        self,
+        sec_data: list[float],
+        temp_f_data: list[float],
+        clock: SimulatedClock,
+        loop: bool = True,
+    ):
+        if not sec_data or len(sec_data) != len(temp_f_data):
+            raise ValueError("Replay curve needs matching, non-empty time and temperature data.")
+        self.sec_data = sec_data
+        self.temp_c_data = [f_to_c(t) for t in temp_f_data]
+        self.clock = clock
+        self.loop = loop
+        self.duration = sec_data[-1] - sec_data[0]
+
+    @property
+    def temperature(self):
+        """Linearly interpolated temperature in celsius."""
+        t = self.clock.elapsed
+        if self.loop and self.duration > 0:
+            t %= self.duration
+        t += self.sec_data[0]
+
+        idx = bisect.bisect_right(self.sec_data, t)
+        if idx == 0:
+            return self.temp_c_data[0]
+        if idx >= len(self.sec_data):
+            return self.temp_c_data[-1]
+
+        t0, t1 = self.sec_data[idx - 1], self.sec_data[idx]
+        y0, y1 = self.temp_c_data[idx - 1], self.temp_c_data[idx]
+        if t1 == t0:
+            return y1
+        return y0 + (y1 - y0) * (t - t0) / (t1 - t0)
+
+
+def synthetic_roast_profile(
+    duration_sec: float = 15 * 60,
+    interval: float = 1.0,
+    start_temp_f: float = 70.0,
+    end_temp_f: float = 465.0,
+    seed: int = 0,
+) -> tuple[list[float], list[float]]:
+    """
+    Generate a plausible roast curve with a declining rate of rise and a
+    short stall around first crack.
+
+    Returns:
+        (seconds from start, temperatures in °F)
+    """
+    rng = random.Random(seed)
+    tau = duration_sec / 2.2
+    first_crack_temp = 400.0
+
+    sec_data, temp_data = [], []
+    steps = int(duration_sec / interval) + 1
+    for i in range(steps):
+        t = i * interval
+        temp = end_temp_f - (end_temp_f - start_temp_f) * math.exp(-t / tau)
+        # Endothermic stall as the beans start to crack
+        temp -= 6.0 * math.exp(-((temp - first_crack_temp) / 8.0) ** 2)
+        temp += rng.gauss(0, 0.4)
+        sec_data.append(t)
+        temp_data.append(temp)
+    return sec_data, temp_data
+
+
+def load_roast_curve(roast_id: int) -> tuple[list[float], list[float]]:
+    """Load (seconds from start, temperatures in °F) for a stored roast."""
+    with next(get_db()) as db:
+        roast = db.query(Roast).filter(Roast.id == roast_id).first()
+        if roast is None:
+            raise ValueError(f"Roast {roast_id} not found.")
+        return load_curves(roast)
+
+
+def initialize_replay(source: str, speedup: float = 60.0) -> tuple[ReplayThermocouple, SimulatedClock]:
+    """
+    Create a replay thermocouple and its clock.
+
+    Args:
+        source (str): "synthetic" or the id of a stored roast.
+        speedup (float): How much faster than real time to replay.
+    """
+    if source == "synthetic":
+        sec_data, temp_data = synthetic_roast_profile()
+    else:
+        sec_data, temp_data = load_roast_curve(int(source))
+
+    clock = SimulatedClock(speedup)
+    return ReplayThermocouple(sec_data, temp_data, clock), clock
@@ -0,0 +1,190 @@
+"""Find stored roasts with similar temperature curves."""
+
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import func
+
+from models import Roast, get_db
+from utils.archive_utils import load_curves
+
+FEATURE_POINTS = 64
+TEMP_SCALE_F = 10.0  # A 10 °F difference at one grid point counts as 1
+DURATION_WEIGHT = 2.0  # Per minute of difference in roast length
+DTW_BAND = 6  # Grid points a curve may shift when DTW re-ranks the shortlist
+
+
+def compute_features(sec_data: list[float], temp_data: list[float]) -> np.ndarray | None:
+    """
+    Resample a roast onto a normalized time grid.
+
+    The feature vector is the curve shape at FEATURE_POINTS evenly spaced
+    fractions of the roast duration, followed by the duration itself. None for
+    a curve with no samples.
+    """
+    sec = np.asarray(sec_data, dtype=np.float64)
+    temp = np.asarray(temp_data, dtype=np.float64)
+    if not len(sec):
+        return None
+    duration = sec[-1] - sec[0] if len(sec) > 1 else 0.0
+
+    grid = sec[0] + np.linspace(0.0, 1.0, FEATURE_POINTS) * duration
+    shape = np.interp(grid, sec, temp) / TEMP_SCALE_F
+    return np.append(shape, duration / 60 * DURATION_WEIGHT).astype(np.float32)
+
+
+def encode_features(features: np.ndarray) -> bytes:
+    """Pack features for the database."""
+    return features.astype(np.float32).tobytes()
+
+
+def features_from_roast(roast: Roast) -> np.ndarray | None:
+    """Compute features from a roast's stored curve."""
+    return compute_features(*load_curves(roast))
+
+
+def backfill_features(batch_size: int = 200) -> int:
+    """Compute features for roasts stored without them. Returns the number updated."""
+    updated, last_id = 0, 0
+    with next(get_db()) as db:
+        # Page by id so roasts with empty curves, which stay without features, are visited once
+        while True:
+            roasts = (
+                db.query(Roast).filter(Roast.features.is_(None), Roast.id > last_id)
+                .order_by(Roast.id).limit(batch_size).all()
+            )
+            if not roasts:
+                break
+            for roast in roasts:
+                try:
+                    features = features_from_roast(roast)
+                except Exception as e:
+                    logging.error("Could not compute features for roast %s: %s", roast.id, e)
+                    continue
+                if features is not None:
+                    roast.features = encode_features(features)
+                    updated += 1
+            db.commit()
+            last_id = roasts[-1].id
+    if updated:
+        logging.info("Computed similarity features for %s roasts.", updated)
+    return updated
+
+
+def dtw_distance(a: np.ndarray, b: np.ndarray, band: int = DTW_BAND) -> float:
+    """Dynamic time warping distance between two equal-length curves."""
+    n = len(a)
+    cost = np.full((n + 1, n + 1), np.inf)
+    cost[0, 0] = 0.0
+    for i in range(1, n + 1):
+        lo, hi = max(1, i - band), min(n, i + band)
+        step = np.abs(a[i - 1] - b[lo - 1:hi])
+        for j, d in zip(range(lo, hi + 1), step):
+            cost[i, j] = d + min(cost[i - 1, j], cost[i, j - 1], cost[i - 1, j - 1])
+    return float(cost[n, n])
+
+
+class FeatureIndex:
+    """
+    In-memory matrix of roast features for vectorized nearest-neighbour queries.
+
+    The matrix is reloaded when the roast count, the number with features,
+    the highest id or the latest start time changes, or after `invalidate`, so
+    inserts and deletes are picked up without a full rescan per query. Roasts
+    stored without features (uploaded or imported) get them from a background
+    backfill and join the index once it finishes.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.signature = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, FEATURE_POINTS + 1), dtype=np.float32)
+        self.backfill_thread: threading.Thread | None = None
+        # Highest roast id a backfill was started for. Roasts with empty curves
+        # never get features, so a count mismatch alone would restart it forever.
+        self.backfilled_max_id = None
+
+    def invalidate(self) -> None:
+        """Reload the matrix on the next query."""
+        with self.lock:
+            self.signature = None
+
+    def backfill_in_background(self) -> None:
+        """Compute missing features off the request path, then reload."""
+        if self.backfill_thread is not None and self.backfill_thread.is_alive():
+            return
+
+        def run():
+            try:
+                backfill_features()
+            except Exception as e:
+                logging.error("Feature backfill failed: %s", e)
+            self.invalidate()
+
+        self.backfill_thread = threading.Thread(target=run, daemon=True)
+        self.backfill_thread.start()
+
+    def refresh(self) -> None:
+        with next(get_db()) as db:
+            signature = tuple(db.query(
+                func.count(Roast.id), func.count(Roast.features), func.max(Roast.id), func.max(Roast.start_time)
+            ).one())
+        if signature == self.signature:
+            return
+
+        if signature[0] > signature[1] and signature[2] != self.backfilled_max_id:
+            self.backfilled_max_id = signature[2]
+            self.backfill_in_background()
+        with next(get_db()) as db:
+            rows = db.query(Roast.id, Roast.features).filter(Roast.features.is_not(None)).all()
+
+        self.ids = np.array([row.id for row in rows], dtype=np.int64)
+        self.matrix = np.frombuffer(
+            b"".join(row.features for row in rows), dtype=np.float32
+        ).reshape(len(rows), FEATURE_POINTS + 1)
+        self.signature = signature
+
+    def query(self, roast_id: int, k: int = 5, dtw_shortlist: int = 0) -> list[tuple[int, float]]:
+        """
+        Return up to k (roast id, distance) pairs most similar to roast_id.
+
+        Args:
+            roast_id (int): Roast to compare against.
+            k (int): Number of results.
+            dtw_shortlist (int): If larger than k, re-rank this many Euclidean
+                nearest neighbours by DTW distance on the curve shape.
+        """
+        with self.lock:
+            self.refresh()
+            ids, matrix = self.ids, self.matrix
+
+        matches = np.flatnonzero(ids == roast_id)
+        if not len(matches):
+            return []
+        target = matrix[matches[0]]
+
+        distances = np.sqrt(((matrix - target) ** 2).sum(axis=1))
+        distances[matches[0]] = np.inf
+
+        n = min(max(k, dtw_shortlist), len(ids) - 1)
+        if n <= 0:
+            return []
+        nearest = np.argpartition(distances, n - 1)[:n]
+        nearest = nearest[np.argsort(distances[nearest])]
+
+        if dtw_shortlist > k:
+            shape = target[:FEATURE_POINTS]
+            duration = target[FEATURE_POINTS]
+            reranked = [
+                (idx, dtw_distance(shape, matrix[idx, :FEATURE_POINTS])
+                 + abs(matrix[idx, FEATURE_POINTS] - duration))
+                for idx in nearest
+            ]
+            reranked.sort(key=lambda pair: pair[1])
+            return [(int(ids[idx]), float(d)) for idx, d in reranked[:k]]
+
+        return [(int(ids[idx]), float(distances[idx])) for idx in nearest[:k]]
+
+
+feature_index = FeatureIndex()
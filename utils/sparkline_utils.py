@@ -0,0 +1,91 @@
+"""Tiny roast curve thumbnails for the history sidebar."""
+
+import json
+import logging
+import threading
+import urllib.parse
+
+import numpy as np
+
+from models import Roast, get_db
+from utils.archive_utils import load_curves
+
+SPARKLINE_POINTS = 48
+# Every thumbnail uses the same temperature scale so they can be compared at a glance
+SPARKLINE_MIN_F = 50.0
+SPARKLINE_MAX_F = 500.0
+
+_backfill_thread: threading.Thread | None = None
+_backfill_lock = threading.Lock()
+
+
+def compute_sparkline(sec_data: list[float], temp_data: list[float]) -> bytes | None:
+    """Resample a curve to SPARKLINE_POINTS evenly spaced points, one byte each. None if empty."""
+    sec = np.asarray(sec_data, dtype=np.float64)
+    temp = np.asarray(temp_data, dtype=np.float64)
+    if not len(sec):
+        return None
+    grid = np.linspace(sec[0], sec[-1], SPARKLINE_POINTS)
+    scaled = (np.interp(grid, sec, temp) - SPARKLINE_MIN_F) / (SPARKLINE_MAX_F - SPARKLINE_MIN_F)
+    return np.round(np.clip(scaled, 0.0, 1.0) * 255).astype(np.uint8).tobytes()
+
+
+def sparkline_from_json(sec_from_start: str, temperature_f: str) -> bytes | None:
+    """Sparkline for curves stored as JSON text, as they arrive from ingest and import."""
+    return compute_sparkline(json.loads(sec_from_start), json.loads(temperature_f))
+
+
+def sparkline_svg(sparkline: bytes) -> str:
+    """Data URI of an SVG polyline for a stored sparkline."""
+    points = " ".join(f"{x},{255 - y}" for x, y in enumerate(sparkline))
+    svg = (
+        f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {len(sparkline) - 1} 255' "
+        "preserveAspectRatio='none'><polyline fill='none' stroke='brown' stroke-width='1.5' "
+        f"vector-effect='non-scaling-stroke' points='{points}'/></svg>"
+    )
+    # Only characters that are unsafe in a data URI get percent-encoded, to keep labels small
+    return "data:image/svg+xml;utf8," + urllib.parse.quote(svg, safe=" ,.:/='<>")
+
+
+def backfill_sparklines(batch_size: int = 200) -> int:
+    """Compute sparklines for roasts stored without them. Returns the number updated."""
+    updated, last_id = 0, 0
+    with next(get_db()) as db:
+        # Page by id so roasts with empty curves, which stay without one, are visited once
+        while True:
+            roasts = (
+                db.query(Roast).filter(Roast.sparkline.is_(None), Roast.id > last_id)
+                .order_by(Roast.id).limit(batch_size).all()
+            )
+            if not roasts:
+                break
+            for roast in roasts:
+                try:
+                    roast.sparkline = compute_sparkline(*load_curves(roast))
+                except Exception as e:
+                    # E.g. a missing archive segment; the other roasts still get theirs
+                    logging.error("Could not compute the sparkline for roast %s: %s", roast.id, e)
+                    continue
+                updated += roast.sparkline is not None
+            db.commit()
+            last_id = roasts[-1].id
+    if updated:
+        logging.info("Computed sparklines for %s roasts.", updated)
+    return updated
+
+
+def start_sparkline_backfill() -> None:
+    """Run backfill_sparklines in a daemon thread, unless a run is already going."""
+    global _backfill_thread
+    with _backfill_lock:
+        if _backfill_thread is not None and _backfill_thread.is_alive():
+            return
+
+        def run():
+            try:
+                backfill_sparklines()
+            except Exception as e:
+                logging.error("Sparkline backfill failed: %s", e)
+
+        _backfill_thread = threading.Thread(target=run, daemon=True)
+        _backfill_thread.start()
@@ -7,10 +7,30 @@ import random
 import threading
 import time
 
+from config import MAINS_HZ, THERMOCOUPLE_AVERAGING, THERMOCOUPLE_TYPE
+from utils.max31856_utils import Max31856, SpiTransport
+
 ROAST_STAGES = ["City", "City+", "Full City", "Full City+", "Vienna"]
 ROAST_TEMPS = [422, 432, 441, 450, 463]  # °F
 
-ROAST_EVENTS = ["1st Crack Start", "2nd Crack Start"]
+ROAST_EVENTS = ["Charge", "Turning Point", "Dry End", "1st Crack Start", "2nd Crack Start", "Drop"]
+CONTROL_INPUTS = ["Heat", "Fan"]  # Percent settings logged whenever they change
+
+# Set while a roast is being recorded, so background jobs can stay out of the way
+recording = threading.Event()
+
+
+class SystemClock:
+    """Wall clock used by the sampler."""
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+    def sleep(self, seconds: float, wake: threading.Event | None = None) -> None:
+        """Sleep, returning early once `wake` is set."""
+        if wake is None:
+            time.sleep(seconds)
+        else:
+            wake.wait(seconds)
 
 
 class MockThermocouple:
@@ -22,54 +42,48 @@ class MockThermocouple:
 
 
 def continually_read_temperature(
-    data_lock: threading.Lock,
-    temp_plot: collections.deque,
-    time_plot: collections.deque,
-    temp_recorded: collections.deque,
-    time_recorded: collections.deque,
-    recording: threading.Event,
-    force_stop_recording: threading.Event,
+    pipeline,
     pi: bool = False,
-    interval: float = 1.0,
-    fahrenheit: bool = True,
+    interval=1.0,
+    thermocouple=None,
+    clock=None,
+    stop: threading.Event | None = None,
+    wake: threading.Event | None = None,
 ) -> None:
     """
     Continually read temperature from thermocouple.
-    
+
     Args:
-        data_lock (threading.Lock): The lock to protect shared data.
-        temp_plot (collections.deque): Deque for plotting temperature.
-        time_plot (collections.deque): Deque for plotting time.
-        temp_recorded (collections.deque): Deque for recording temperature.
-        time_recorded (collections.deque): Deque for recording time.
-        recording (threading.Event): Event to mark if currently recording.
-        force_stop_recording (threading.Event): Event to mark if the recording maxlen is reached.
-        interval (float): Seconds between readings.
-        fahrenheit (bool): Option to convert readings to fahrenheit.
+        pipeline: Sample pipeline (see utils/pipeline_utils.py) that converts,
+            filters and stores each reading.
+        pi (bool): Read from the MAX31856 instead of the mock thermocouple.
+        interval: Seconds between readings, or a callable returning the next
+            interval (e.g. `AdaptiveSampling.next_interval`).
+        thermocouple: Sensor with a `temperature` property in celsius. Created from `pi` if None.
+        clock: Object with `now()` and `sleep()`. Defaults to SystemClock.
+        stop (threading.Event): Optional event that ends the loop when set.
+        wake (threading.Event): Optional event that cuts the wait before the
+            next reading short, e.g. when recording starts during a slow idle
+            interval. Cleared after each wait.
     """
-    thermocouple = initialize_thermocouple(pi)
+    if thermocouple is None:
+        thermocouple = initialize_thermocouple(pi)
+    if clock is None:
+        clock = SystemClock()
 
-    while True:
+    while stop is None or not stop.is_set():
         try:
-            reading_time = datetime.datetime.now()
+            reading_time = clock.now()
             temp = thermocouple.temperature
-            if fahrenheit:
-                temp = c_to_f(temp)
-
-            with data_lock:
-                temp_plot.append(temp)
-                time_plot.append(reading_time)
-
-                if recording.is_set():
-                    record_data(
-                        temp, reading_time, temp_recorded, time_recorded, force_stop_recording
-                    )
-
-            time.sleep(interval)
+            # Wall clock stamp for latency tracing, independent of simulated clocks
+            pipeline.push(reading_time, temp, read_at=time.time())
+            clock.sleep(interval() if callable(interval) else interval, wake)
 
         except Exception as e:
             logging.error(f"Error reading temperature: {e}")
-            time.sleep(interval)
+            clock.sleep(interval() if callable(interval) else interval, wake)
+        if wake is not None:
+            wake.clear()
 
 
 def initialize_thermocouple(pi: bool = False):
@@ -77,14 +91,13 @@ def initialize_thermocouple(pi: bool = False):
     if not pi:
         return MockThermocouple()
 
-    import adafruit_max31856
     import board
     import digitalio
 
     spi = board.SPI()
     cs = digitalio.DigitalInOut(board.D5)
     cs.direction = digitalio.Direction.OUTPUT
-    return adafruit_max31856.MAX31856(spi, cs)
+    return Max31856(SpiTransport(spi, cs), THERMOCOUPLE_AVERAGING, MAINS_HZ, THERMOCOUPLE_TYPE)
 
 
 def record_data(